@@ -0,0 +1,4 @@
+"""
+Benchmarks of the index ingestion and rendering hot paths, run against a
+local fake index by ``./manage.py benchmark_pypackage``.
+"""
@@ -0,0 +1,119 @@
+"""
+A local stand-in for PyPI's XML-RPC interface serving synthetic packages.
+"""
+import random
+import threading
+import time
+from SimpleXMLRPCServer import SimpleXMLRPCServer, SimpleXMLRPCRequestHandler
+from SocketServer import ThreadingMixIn
+
+
+class QuietRequestHandler(SimpleXMLRPCRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+
+class ThreadingXMLRPCServer(ThreadingMixIn, SimpleXMLRPCServer):
+    daemon_threads = True
+
+
+class FakeIndex(object):
+    """
+    Serves ``packages``, a dict mapping a package name to its number of
+    releases, each with a description of ``description_size`` bytes.
+
+    Every call sleeps for ``latency`` seconds and fails with a fault at
+    ``fault_rate``, and ``calls`` counts the calls made to each method.
+    """
+    def __init__(self, packages, description_size=2000, latency=0,
+            fault_rate=0, multicall=True, seed=0):
+        self.packages = packages
+        self.description_size = description_size
+        self.latency = latency
+        self.fault_rate = fault_rate
+        self.multicall = multicall
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.server = None
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%s/' % self.server.server_address[1]
+
+    def start(self):
+        self.server = ThreadingXMLRPCServer(('127.0.0.1', 0),
+                QuietRequestHandler, allow_none=True, logRequests=False)
+        for method in ('package_releases', 'release_data', 'release_urls',
+                'list_packages', 'changelog_last_serial'):
+            self.server.register_function(self.instrumented(method), method)
+        if self.multicall:
+            self.server.register_multicall_functions()
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.setDaemon(True)
+        thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def instrumented(self, method):
+        implementation = getattr(self, method)
+        def call(*args):
+            with self.lock:
+                self.calls[method] = self.calls.get(method, 0) + 1
+                fail = self.random.random() < self.fault_rate
+            if self.latency:
+                time.sleep(self.latency)
+            if fail:
+                raise Exception("injected fault in %s" % method)
+            return implementation(*args)
+        return call
+
+    def versions(self, name):
+        return ['0.%d' % i for i in range(self.packages.get(name, 0))]
+
+    def package_releases(self, name, show_hidden=False):
+        versions = self.versions(name)
+        if show_hidden:
+            return versions
+        return versions[-1:]
+
+    def release_data(self, name, version):
+        if version not in self.versions(name):
+            return {}
+        return {
+            'name': name,
+            'version': version,
+            '_pypi_hidden': version != self.versions(name)[-1],
+            'license': 'UNKNOWN',
+            'classifiers': [
+                'Development Status :: 4 - Beta',
+                'Framework :: Django',
+                'License :: OSI Approved :: BSD License',
+                'Programming Language :: Python',
+            ],
+            'summary': 'Synthetic package %s' % name,
+            'description': ('%s %s ' % (name, version) * self.description_size
+                )[:self.description_size],
+            'home_page': 'http://github.com/fake/%s/' % name,
+            'author': 'Fake Author',
+            'author_email': 'author@example.com',
+            'keywords': 'fake synthetic benchmark',
+        }
+
+    def release_urls(self, name, version):
+        if version not in self.versions(name):
+            return []
+        return [
+            {'filename': '%s-%s.tar.gz' % (name, version), 'downloads': 100},
+            {'filename': '%s-%s.zip' % (name, version), 'downloads': 10},
+        ]
+
+    def list_packages(self):
+        return sorted(self.packages.keys())
+
+    def changelog_last_serial(self):
+        return 0
@@ -0,0 +1,79 @@
+import time
+
+from django.db import connection
+from django.template import Context, Template
+
+from package.models import Package
+from pypackage.benchmarks.fakeindex import FakeIndex
+from pypackage.cache import index_cache
+from pypackage.models import PyPackage
+from pypackage.urls import GRID_ATTRIBUTES
+
+
+def measure(func, *args, **kwargs):
+    """
+    Run ``func`` returning its wall time in seconds and the number of
+    database queries it made.
+    """
+    connection.use_debug_cursor = True
+    connection.queries = []
+    started = time.time()
+    func(*args, **kwargs)
+    return time.time() - started, len(connection.queries)
+
+
+def average(func, repeat):
+    seconds, queries = measure(lambda: [func() for i in range(repeat)])
+    return {'seconds': seconds / repeat, 'queries': queries / float(repeat)}
+
+
+def grid_template():
+    # only the PyPI attributes of the grid are ours to measure
+    cells = ''.join('<td>{{ package.%s }}</td>' % attribute
+            for attribute, label in GRID_ATTRIBUTES
+            if attribute.startswith('pypi.'))
+    return Template('{%% load pypackage_tags %%}{%% if prefetch %%}'
+            '{%% prefetch_pypi packages %%}{%% endif %%}'
+            '{%% for package in packages %%}<tr>%s</tr>{%% endfor %%}' % cells)
+
+
+def run(sizes, description_size=2000, workers=None, repeat=20):
+    """
+    Benchmark ingesting a package with each of ``sizes`` releases from a
+    fake index, reading its latest release and downloads, and rendering the
+    grid's PyPI cells for all of them.
+    """
+    packages = dict(('bench-%d' % size, size) for size in sizes)
+    index = FakeIndex(packages, description_size=description_size).start()
+    results = {'fetch_releases': [], 'latest': [], 'downloads': []}
+    try:
+        for size in sizes:
+            name = 'bench-%d' % size
+            index_cache.clear()
+            package = Package.objects.create(title=name, slug=name)
+            pypackage = PyPackage.objects.create(packaginator_package=package,
+                    name=name, index_api_url=index.url)
+            seconds, queries = measure(pypackage.fetch_releases,
+                    workers=workers)
+            results['fetch_releases'].append({'releases': size,
+                'seconds': seconds, 'queries': queries})
+
+            latest = average(pypackage.releases.latest, repeat)
+            latest['releases'] = size
+            results['latest'].append(latest)
+            downloads = average(
+                    lambda: PyPackage.objects.get(pk=pypackage.pk).downloads,
+                    repeat)
+            downloads['releases'] = size
+            results['downloads'].append(downloads)
+    finally:
+        index.stop()
+
+    template = grid_template()
+    for prefetch in (False, True):
+        packages = list(Package.objects.filter(title__startswith='bench-'))
+        seconds, queries = measure(template.render,
+                Context({'packages': packages, 'prefetch': prefetch}))
+        results['grid_prefetched' if prefetch else 'grid'] = {
+            'packages': len(packages), 'seconds': seconds, 'queries': queries}
+    return results
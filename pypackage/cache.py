@@ -0,0 +1,133 @@
+"""
+Caching of index responses, keyed by index url, method and arguments.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.utils.hashcompat import md5_constructor
+from django.utils.importlib import import_module
+
+from pypackage import conf
+
+
+class MemoryBackend(object):
+    """
+    An in-process cache evicting the least recently used entry once it
+    holds ``max_entries``.
+    """
+    def __init__(self, max_entries=None):
+        if max_entries is None:
+            max_entries = conf.CACHE_MAX_ENTRIES
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            try:
+                expires, value = self.entries.pop(key)
+            except KeyError:
+                return None
+            if expires < time.time():
+                return None
+            # move it to the most recently used end
+            self.entries[key] = (expires, value)
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = (time.time() + ttl, value)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class DjangoBackend(object):
+    """
+    Caches through the project's Django cache, shared between processes.
+    """
+    prefix = 'pypackage.index:'
+
+    def __init__(self):
+        from django.core.cache import cache
+        self.cache = cache
+
+    def get(self, key):
+        return self.cache.get(self.prefix + md5_constructor(key).hexdigest())
+
+    def set(self, key, value, ttl):
+        self.cache.set(self.prefix + md5_constructor(key).hexdigest(), value,
+                ttl)
+
+    def clear(self):
+        # entries sharing the project cache can only be left to expire
+        pass
+
+BACKENDS = {
+    'memory': MemoryBackend,
+    'django': DjangoBackend,
+}
+
+def get_backend(name):
+    if name in BACKENDS:
+        return BACKENDS[name]()
+    module, attr = name.rsplit('.', 1)
+    return getattr(import_module(module), attr)()
+
+
+class IndexCache(object):
+    """
+    Index responses cached for a per-method ``ttls``, counting hits and
+    misses per method.
+    """
+    def __init__(self, backend, ttls=None):
+        if ttls is None:
+            ttls = conf.CACHE_TTLS
+        self.backend = backend
+        self.ttls = ttls
+        self.lock = threading.Lock()
+        self.hits = {}
+        self.misses = {}
+
+    def key(self, index_api_url, method, args):
+        return repr((index_api_url, method, args))
+
+    def _count(self, counts, method):
+        with self.lock:
+            counts[method] = counts.get(method, 0) + 1
+
+    def get(self, index_api_url, method, *args):
+        """
+        Return the cached response for the call, or None.
+        """
+        if not self.ttls.get(method):
+            return None
+        value = self.backend.get(self.key(index_api_url, method, args))
+        if value is None:
+            self._count(self.misses, method)
+        else:
+            self._count(self.hits, method)
+        return value
+
+    def set(self, index_api_url, method, args, value):
+        ttl = self.ttls.get(method)
+        if ttl and value is not None:
+            self.backend.set(self.key(index_api_url, method, args), value,
+                    ttl)
+
+    def clear(self):
+        self.backend.clear()
+        with self.lock:
+            self.hits.clear()
+            self.misses.clear()
+
+    def stats(self):
+        with self.lock:
+            return {'hits': dict(self.hits), 'misses': dict(self.misses)}
+
+index_cache = IndexCache(get_backend(conf.CACHE_BACKEND))
@@ -0,0 +1,428 @@
+"""
+Access to package indexes speaking the PyPI XML-RPC interface.
+
+(see http://wiki.python.org/moin/PyPiXmlRpc)
+"""
+import Queue
+import re
+import socket
+import threading
+import time
+import xmlrpclib
+from contextlib import contextmanager
+
+from django.utils.importlib import import_module
+
+from pypackage import conf, instrumentation, ratelimit
+from pypackage.cache import index_cache
+
+
+method_name_re = re.compile(r'<methodName>([^<]*)</methodName>')
+
+# errors worth trying a call again for, unlike faults, which are the index's
+# answer; timeouts are socket errors too
+TRANSIENT_ERRORS = (socket.error, xmlrpclib.ProtocolError)
+
+
+def retry_delay(attempt):
+    """
+    Seconds to wait before retry number ``attempt``, counting from 1.
+    """
+    return conf.FETCH_RETRY_DELAY * 2 ** (attempt - 1)
+
+
+class CountingResponse(object):
+    """
+    Wraps an HTTP response to count the bytes and time spent reading it.
+    """
+    def __init__(self, response):
+        self.response = response
+        self.bytes = 0
+        self.seconds = 0
+
+    def read(self, *args):
+        started = time.time()
+        data = self.response.read(*args)
+        self.seconds += time.time() - started
+        self.bytes += len(data)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+
+class TimeoutTransport(xmlrpclib.Transport):
+    """
+    A keep-alive HTTP transport whose connections give up after ``timeout``
+    seconds, reporting whether each request reused its connection to
+    ``pool``. Requests wait on the rate limit of ``index_api_url``.
+    """
+    base = xmlrpclib.Transport
+    index_api_url = None
+
+    def __init__(self, timeout=None, pool=None, *args, **kwargs):
+        self.base.__init__(self, *args, **kwargs)
+        self.timeout = timeout
+        self.pool = pool
+
+    def make_connection(self, host):
+        current_host, current = getattr(self, '_connection', (None, None))
+        reused = (current_host == host and
+                getattr(current, 'sock', None) is not None)
+        connection = self.base.make_connection(self, host)
+        if self.timeout is not None:
+            connection.timeout = self.timeout
+            if connection.sock is not None:
+                connection.sock.settimeout(self.timeout)
+        if self.pool is not None:
+            self.pool.count(reused)
+        return connection
+
+    def request(self, host, handler, request_body, verbose=0):
+        match = method_name_re.search(request_body)
+        name = 'index.%s' % (match and match.group(1) or 'unknown')
+        with ratelimit.limit(self.index_api_url or
+                'http://%s%s' % (host, handler)):
+            with instrumentation.timed(name, queries=False):
+                return self.base.request(self, host, handler, request_body,
+                        verbose)
+
+    def parse_response(self, response):
+        if not instrumentation.sinks:
+            return self.base.parse_response(self, response)
+        counted = CountingResponse(response)
+        started = time.time()
+        result = self.base.parse_response(self, counted)
+        instrumentation.incr('index.bytes_received', counted.bytes)
+        instrumentation.timing('index.read', counted.seconds)
+        instrumentation.timing('index.parse',
+                time.time() - started - counted.seconds)
+        return result
+
+
+class SafeTimeoutTransport(TimeoutTransport, xmlrpclib.SafeTransport):
+    """
+    The HTTPS counterpart of ``TimeoutTransport``.
+    """
+    base = xmlrpclib.SafeTransport
+
+
+class TransportPool(object):
+    """
+    Keep-alive transports shared by everything talking to an index, keeping
+    at most ``size`` idle transports per index url.
+    """
+    def __init__(self, size):
+        self.size = size
+        self.lock = threading.Lock()
+        self.idle = {}
+        self.new_connections = 0
+        self.reused_connections = 0
+
+    def count(self, reused):
+        with self.lock:
+            if reused:
+                self.reused_connections += 1
+            else:
+                self.new_connections += 1
+
+    def acquire(self, index_api_url, timeout=None):
+        with self.lock:
+            idle = self.idle.get(index_api_url)
+            if idle:
+                transport = idle.pop()
+                transport.timeout = timeout
+                return transport
+        if index_api_url.startswith('https'):
+            transport = SafeTimeoutTransport(timeout, self)
+        else:
+            transport = TimeoutTransport(timeout, self)
+        transport.index_api_url = index_api_url
+        return transport
+
+    def release(self, index_api_url, transport):
+        with self.lock:
+            idle = self.idle.setdefault(index_api_url, [])
+            if len(idle) < self.size:
+                idle.append(transport)
+                return
+        transport.close()
+
+    def clear(self):
+        with self.lock:
+            idle, self.idle = self.idle, {}
+        for transports in idle.values():
+            for transport in transports:
+                transport.close()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'new': self.new_connections,
+                'reused': self.reused_connections,
+                'idle': sum(len(t) for t in self.idle.values()),
+            }
+
+pool = TransportPool(conf.POOL_SIZE)
+
+
+@contextmanager
+def connect(index_api_url, timeout=None):
+    """
+    Provide an XML-RPC proxy for the index at ``index_api_url`` on a pooled
+    transport, which goes back to the pool once the block is done with it.
+
+    A proxy holds a single connection and must not be shared between threads.
+    """
+    if timeout is None:
+        timeout = conf.FETCH_TIMEOUT
+    transport = pool.acquire(index_api_url, timeout)
+    try:
+        yield xmlrpclib.Server(index_api_url, transport=transport)
+    except Exception:
+        # the connection may be left in an unusable state
+        transport.close()
+        raise
+    pool.release(index_api_url, transport)
+
+
+def call(index_api_url, method, *args, **kwargs):
+    """
+    Call ``method`` on the index at ``index_api_url``, answering from the
+    cache when it holds a fresh response. Calls failing with transient
+    errors are tried again up to ``PYPACKAGE_FETCH_RETRIES`` times.
+
+    Takes ``timeout`` and ``use_cache`` keyword arguments.
+    """
+    timeout = kwargs.pop('timeout', None)
+    use_cache = kwargs.pop('use_cache', True)
+    if use_cache:
+        value = index_cache.get(index_api_url, method, *args)
+        if value is not None:
+            return value
+    for attempt in range(conf.FETCH_RETRIES + 1):
+        if attempt:
+            time.sleep(retry_delay(attempt))
+        try:
+            with connect(index_api_url, timeout) as proxy:
+                value = getattr(proxy, method)(*args)
+            break
+        except TRANSIENT_ERRORS:
+            if attempt == conf.FETCH_RETRIES:
+                raise
+    index_cache.set(index_api_url, method, args, value)
+    return value
+
+
+# indexes found not to implement system.multicall
+_no_multicall = set()
+
+
+def _fetch_batch(proxy, index_api_url, package_name, batch, methods):
+    """
+    Call each of ``methods`` for every version in ``batch`` in a single
+    ``system.multicall`` round trip, falling back to one call per method on
+    indexes that don't support it.
+    """
+    fetched = {}
+    failed = {}
+    if len(batch) > 1 and index_api_url not in _no_multicall:
+        multicall = xmlrpclib.MultiCall(proxy)
+        for version in batch:
+            for method in methods:
+                getattr(multicall, method)(package_name, version)
+        try:
+            results = multicall()
+        except xmlrpclib.Fault:
+            _no_multicall.add(index_api_url)
+        else:
+            n = len(methods)
+            for i, version in enumerate(batch):
+                try:
+                    fetched[version] = tuple(results[n * i + j]
+                            for j in range(n))
+                except xmlrpclib.Fault as e:
+                    failed[version] = e
+            return fetched, failed
+
+    for version in batch:
+        try:
+            fetched[version] = tuple(getattr(proxy, method)(package_name,
+                    version) for method in methods)
+        except Exception as e:
+            failed[version] = e
+    return fetched, failed
+
+
+def _fetch_versions(index_api_url, package_name, versions, methods, workers,
+        timeout, batch_size, use_cache):
+    """
+    Gather the responses to each of ``methods`` for each of ``versions``
+    using a bounded pool of worker threads, each sending its versions in
+    ``system.multicall`` batches of up to ``batch_size``. Versions failing
+    with transient errors are tried again up to ``PYPACKAGE_FETCH_RETRIES``
+    times, backing off exponentially.
+
+    Returns a ``(fetched, failed)`` pair of dicts: ``fetched`` maps a version
+    to a tuple of its responses, in the order of ``methods``, and ``failed``
+    maps a version to the exception raised while fetching it.
+    """
+    if workers is None:
+        workers = conf.FETCH_WORKERS
+    if batch_size is None:
+        batch_size = conf.MULTICALL_SIZE
+    fetched = {}
+    if use_cache:
+        uncached = []
+        for version in versions:
+            responses = tuple(index_cache.get(index_api_url, method,
+                    package_name, version) for method in methods)
+            if None not in responses:
+                fetched[version] = responses
+            else:
+                uncached.append(version)
+        versions = uncached
+
+    failed = {}
+    for attempt in range(conf.FETCH_RETRIES + 1):
+        if attempt:
+            time.sleep(retry_delay(attempt))
+        attempt_fetched, attempt_failed = _fetch_pool(index_api_url,
+                package_name, versions, methods, workers, timeout, batch_size)
+        fetched.update(attempt_fetched)
+        for version in attempt_fetched:
+            failed.pop(version, None)
+        failed.update(attempt_failed)
+        versions = [v for v, e in attempt_failed.items()
+                if isinstance(e, TRANSIENT_ERRORS)]
+        if not versions:
+            break
+    return fetched, failed
+
+
+def _fetch_pool(index_api_url, package_name, versions, methods, workers,
+        timeout, batch_size):
+    # a single attempt of _fetch_versions
+    fetched = {}
+    failed = {}
+    workers = max(1, workers)
+    # don't let big batches starve the pool of work
+    batch_size = max(1, min(batch_size, -(-len(versions) // workers)))
+
+    pending = Queue.Queue()
+    for i in range(0, len(versions), batch_size):
+        pending.put(versions[i:i + batch_size])
+    workers = max(1, min(workers, pending.qsize()))
+
+    def work():
+        while True:
+            try:
+                batch = pending.get_nowait()
+            except Queue.Empty:
+                return
+            try:
+                with connect(index_api_url, timeout) as proxy:
+                    batch_fetched, batch_failed = _fetch_batch(proxy,
+                            index_api_url, package_name, batch, methods)
+            except Exception as e:
+                for version in batch:
+                    failed[version] = e
+                continue
+            for version, responses in batch_fetched.items():
+                for method, value in zip(methods, responses):
+                    index_cache.set(index_api_url, method,
+                            (package_name, version), value)
+            fetched.update(batch_fetched)
+            failed.update(batch_failed)
+
+    if workers == 1:
+        work()
+        return fetched, failed
+
+    threads = [threading.Thread(target=ratelimit.inherit(work))
+            for i in range(workers)]
+    for thread in threads:
+        thread.setDaemon(True)
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return fetched, failed
+
+
+def fetch_release_data(index_api_url, package_name, versions, workers=None,
+        timeout=None, batch_size=None, use_cache=True):
+    """
+    Gather ``release_data`` and ``release_urls`` for each of ``versions``
+    using a bounded pool of worker threads, each sending its versions in
+    ``system.multicall`` batches of up to ``batch_size``. Versions with both
+    responses cached aren't fetched again unless ``use_cache`` is False.
+
+    Returns a ``(fetched, failed)`` pair of dicts: ``fetched`` maps a version
+    to its ``(release_data, release_urls)`` and ``failed`` maps a version to
+    the exception raised while fetching it.
+    """
+    return _fetch_versions(index_api_url, package_name, versions,
+            ('release_data', 'release_urls'), workers, timeout, batch_size,
+            use_cache)
+
+
+def fetch_release_urls(index_api_url, package_name, versions, workers=None,
+        timeout=None, batch_size=None, use_cache=False):
+    """
+    Gather just ``release_urls`` for each of ``versions``, as
+    ``fetch_release_data`` does, for refreshing download counts. Cached
+    responses are only used when ``use_cache`` is True.
+
+    Returns a ``(fetched, failed)`` pair of dicts, with ``fetched`` mapping
+    a version to its ``release_urls``.
+    """
+    fetched, failed = _fetch_versions(index_api_url, package_name, versions,
+            ('release_urls',), workers, timeout, batch_size, use_cache)
+    return dict((v, r[0]) for v, r in fetched.items()), failed
+
+
+class XMLRPCBackend(object):
+    """
+    Talks to an index through the PyPI XML-RPC interface.
+    """
+    def __init__(self, index_api_url):
+        self.index_api_url = index_api_url
+
+    def package_releases(self, name, show_hidden=False, timeout=None,
+            use_cache=True):
+        return call(self.index_api_url, 'package_releases', name,
+                show_hidden, timeout=timeout, use_cache=use_cache)
+
+    def fetch_release_data(self, name, versions, **kwargs):
+        return fetch_release_data(self.index_api_url, name, versions,
+                **kwargs)
+
+    def fetch_release_urls(self, name, versions, **kwargs):
+        return fetch_release_urls(self.index_api_url, name, versions,
+                **kwargs)
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend(index_api_url):
+    """
+    Return the backend for ``index_api_url``, as configured by
+    ``PYPACKAGE_INDEX_BACKENDS``.
+
+    Backends provide ``package_releases(name, show_hidden)``,
+    ``fetch_release_data(name, versions)`` and
+    ``fetch_release_urls(name, versions)``, all also taking ``timeout`` and
+    ``use_cache`` keyword arguments, with the latter two returning the same
+    ``(fetched, failed)`` pairs as the module level functions of those
+    names.
+    """
+    with _backends_lock:
+        if index_api_url not in _backends:
+            path = conf.INDEX_BACKENDS.get(index_api_url,
+                    conf.DEFAULT_INDEX_BACKEND)
+            module, attr = path.rsplit('.', 1)
+            backend_class = getattr(import_module(module), attr)
+            _backends[index_api_url] = backend_class(index_api_url)
+        return _backends[index_api_url]
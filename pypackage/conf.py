@@ -0,0 +1,96 @@
+"""
+Settings for pypackage, each of which can be overridden from the project
+settings module using the ``PYPACKAGE_`` prefixed name.
+"""
+from django.conf import settings
+
+# number of threads used to gather release metadata from the index
+FETCH_WORKERS = getattr(settings, 'PYPACKAGE_FETCH_WORKERS', 4)
+
+# seconds to wait on a single index call before giving up on it
+FETCH_TIMEOUT = getattr(settings, 'PYPACKAGE_FETCH_TIMEOUT', 30)
+
+# times a failed index call is tried again, and the seconds waited before
+# the first retry, doubling with each one
+FETCH_RETRIES = getattr(settings, 'PYPACKAGE_FETCH_RETRIES', 2)
+FETCH_RETRY_DELAY = getattr(settings, 'PYPACKAGE_FETCH_RETRY_DELAY', 1)
+
+# releases written per transaction by fetch_releases
+STORE_CHUNK_SIZE = getattr(settings, 'PYPACKAGE_STORE_CHUNK_SIZE', 100)
+
+# versions fetched per system.multicall round trip, 0 disables multicall
+MULTICALL_SIZE = getattr(settings, 'PYPACKAGE_MULTICALL_SIZE', 50)
+
+# idle keep-alive connections kept per index
+POOL_SIZE = getattr(settings, 'PYPACKAGE_POOL_SIZE', 8)
+
+# rows written per INSERT statement when storing releases in bulk
+BULK_SIZE = getattr(settings, 'PYPACKAGE_BULK_SIZE', 200)
+
+# releases shown per page of a package's release history
+RELEASE_PAGE_SIZE = getattr(settings, 'PYPACKAGE_RELEASE_PAGE_SIZE', 20)
+
+# days over which PyPackage.downloads_growth is counted
+GROWTH_DAYS = getattr(settings, 'PYPACKAGE_GROWTH_DAYS', 30)
+
+# where index responses are cached: 'memory', 'django' or the dotted path
+# of a backend class
+CACHE_BACKEND = getattr(settings, 'PYPACKAGE_CACHE_BACKEND', 'memory')
+
+# most responses kept by the in-process memory backend
+CACHE_MAX_ENTRIES = getattr(settings, 'PYPACKAGE_CACHE_MAX_ENTRIES', 1000)
+
+# seconds each index method's responses are cached for, methods not listed
+# are never cached
+CACHE_TTLS = getattr(settings, 'PYPACKAGE_CACHE_TTLS', {
+    'package_releases': 300,
+    'release_data': 3600,
+    'release_urls': 300,
+})
+
+# dotted path of the backend used for indexes not in INDEX_BACKENDS
+DEFAULT_INDEX_BACKEND = getattr(settings, 'PYPACKAGE_DEFAULT_INDEX_BACKEND',
+        'pypackage.client.XMLRPCBackend')
+
+# dotted paths of the backends used for particular index urls, for example
+# {'https://pypi.org/pypi/': 'pypackage.jsonapi.JSONBackend'}
+INDEX_BACKENDS = getattr(settings, 'PYPACKAGE_INDEX_BACKENDS', {})
+
+# calls a second, and the burst of calls allowed, for indexes not in
+# RATE_LIMITS, or None or {} for no limit. Limits hold within a single
+# process: web processes, run_fetch_worker and refresh_pypackages each get
+# the full allowance, so divide the rate an index tolerates between them
+DEFAULT_RATE_LIMIT = getattr(settings, 'PYPACKAGE_DEFAULT_RATE_LIMIT',
+        {'rate': 20, 'burst': 40})
+
+# rate limits of particular index urls, for example
+# {'http://mirror.example.com/pypi/': {'rate': 100, 'burst': 100}}
+RATE_LIMITS = getattr(settings, 'PYPACKAGE_RATE_LIMITS', {})
+
+# seconds after which an index call counts as slow, slowing later calls down
+RATE_LIMIT_SLOW = getattr(settings, 'PYPACKAGE_RATE_LIMIT_SLOW', 5)
+
+# hand release fetching triggered by web requests to run_fetch_worker
+# instead of doing it inline
+ASYNC_FETCH = getattr(settings, 'PYPACKAGE_ASYNC_FETCH', False)
+
+# seconds a worker may hold a job before another worker can take it over
+JOB_LEASE = getattr(settings, 'PYPACKAGE_JOB_LEASE', 600)
+
+# seconds before a failed job is first retried, doubling with each attempt
+JOB_RETRY_DELAY = getattr(settings, 'PYPACKAGE_JOB_RETRY_DELAY', 60)
+
+# attempts after which a failing job is left alone until enqueued again
+JOB_MAX_ATTEMPTS = getattr(settings, 'PYPACKAGE_JOB_MAX_ATTEMPTS', 5)
+
+# home pages whose resolved repository urls are remembered
+REPO_URL_CACHE_SIZE = getattr(settings, 'PYPACKAGE_REPO_URL_CACHE_SIZE', 10000)
+
+# dotted paths of the classes timings and counters are sent to, such as
+# pypackage.instrumentation.LoggingSink or StatsdSink
+INSTRUMENTATION_SINKS = getattr(settings, 'PYPACKAGE_INSTRUMENTATION_SINKS', [])
+
+# where StatsdSink sends its UDP packets, and the prefix of its stat names
+STATSD_HOST = getattr(settings, 'PYPACKAGE_STATSD_HOST', 'localhost')
+STATSD_PORT = getattr(settings, 'PYPACKAGE_STATSD_PORT', 8125)
+STATSD_PREFIX = getattr(settings, 'PYPACKAGE_STATSD_PREFIX', 'pypackage.')
@@ -0,0 +1,132 @@
+"""
+Seeding the database from a local dump of an index's metadata, without any
+network access.
+
+Two dump formats are read, both streamed so memory use doesn't grow with the
+size of the dump:
+
+* JSON lines, one package per line::
+
+    {"name": "foo", "releases": {"1.0": {"data": {...}, "urls": [...]}}}
+
+  where ``data`` and ``urls`` are a release's ``release_data`` and
+  ``release_urls`` responses.
+
+* SQLite, with a ``releases`` table of ``name``, ``version``,
+  ``release_data`` and ``release_urls`` columns, the latter two holding the
+  same responses as JSON text.
+"""
+import itertools
+import json
+import sqlite3
+
+from django.db import transaction
+from django.template.defaultfilters import slugify
+
+from package.models import Package
+from pypackage import conf
+from pypackage.models import IndexName, PyPackage, PyRelease
+from pypackage.utils import bulk_get, bulk_insert
+
+
+def read_jsonl(path):
+    """
+    Yield ``(name, releases)`` for each package in the JSON lines dump at
+    ``path``, ``releases`` mapping a version to its
+    ``(release_data, release_urls)``.
+    """
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            package = json.loads(line)
+            yield package['name'], dict(
+                    (version, (r.get('data') or {}, r.get('urls') or []))
+                    for version, r in package.get('releases', {}).items())
+
+
+def read_sqlite(path):
+    """
+    Yield ``(name, releases)`` for each package in the SQLite dump at
+    ``path``, as ``read_jsonl`` does.
+    """
+    db = sqlite3.connect(path)
+    try:
+        rows = db.execute("SELECT name, version, release_data, release_urls "
+                "FROM releases ORDER BY name")
+        for name, group in itertools.groupby(rows, lambda row: row[0]):
+            yield name, dict((version, (json.loads(data or '{}'),
+                    json.loads(urls or '[]')))
+                    for name, version, data, urls in group)
+    finally:
+        db.close()
+
+
+def read_dump(path):
+    """
+    Read the dump at ``path``, telling its format from the file name.
+    """
+    if path.endswith(('.sqlite', '.sqlite3', '.db')):
+        return read_sqlite(path)
+    return read_jsonl(path)
+
+
+def import_dump(packages, index_api_url, batch_size=None):
+    """
+    Store the ``(name, releases)`` pairs of ``packages`` as packages hosted
+    on ``index_api_url``, ``batch_size`` packages per transaction. Releases
+    we already have are left alone.
+
+    Returns the number of packages and of releases stored.
+    """
+    if batch_size is None:
+        batch_size = conf.BULK_SIZE
+    package_count = release_count = 0
+    packages = iter(packages)
+    while True:
+        batch = list(itertools.islice(packages, batch_size))
+        if not batch:
+            return package_count, release_count
+        release_count += import_batch(batch, index_api_url)
+        package_count += len(batch)
+
+
+@transaction.commit_on_success
+def import_batch(batch, index_api_url):
+    """
+    Store a batch of ``(name, releases)`` pairs in a single transaction,
+    returning the number of releases stored.
+    """
+    releases_by_name = dict(batch)
+    names = releases_by_name.keys()
+
+    slugs = dict((name, slugify(name)) for name in names)
+    packages = bulk_get(Package, 'slug', slugs.values())
+    missing = [Package(title=name, slug=slugs[name]) for name in names
+            if slugs[name] not in packages]
+    if missing:
+        bulk_insert(Package, missing)
+        packages = bulk_get(Package, 'slug', slugs.values())
+
+    # the dump says these are on the index, so PyPackage.save, which bulk
+    # inserts fall back to on older Django, needn't ask it
+    IndexName.objects._update_names(index_api_url, names)
+    pypackages = bulk_get(PyPackage, 'name', names)
+    missing = [PyPackage(name=name, index_api_url=index_api_url,
+            packaginator_package=packages[slugs[name]]) for name in names
+            if name not in pypackages]
+    if missing:
+        bulk_insert(PyPackage, missing)
+        pypackages = bulk_get(PyPackage, 'name', names)
+
+    known = set(PyRelease.objects.filter(
+            pypackage__in=pypackages.values()).values_list(
+            'pypackage__name', 'version'))
+    stored = 0
+    for name, pypackage in pypackages.items():
+        fetched = dict((version, release)
+                for version, release in releases_by_name[name].items()
+                if (name, version) not in known)
+        fetched = pypackage._clean(fetched, {})
+        stored += len(pypackage._store_releases(fetched))
+    return stored
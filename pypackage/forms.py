@@ -5,7 +5,8 @@ from django.forms import ModelForm
 from django.template.defaultfilters import slugify
 
 from package.models import Package, PackageExample
-from pypackage.models import PyPackage
+from pypackage import ratelimit
+from pypackage.models import IndexName, PyPackage
 
 pypi_url_help_text = settings.PACKAGINATOR_HELP_TEXT['PYPI_URL']
 
@@ -19,13 +20,17 @@ class PyPackageForm(ModelForm):
     def clean_pypi_slug(self):
         if self.cleaned_data['pypi_slug']:
             slug = self.cleaned_data['pypi_slug']
-            try:
-                PyPackage.objects.get(name=slug)
-                # if we already have a pypackage with this slug, its an error
+            # the index matches names regardless of case, and so must we, as
+            # we store its spelling rather than the one typed in
+            if PyPackage.objects.filter(name__iexact=slug).exists():
                 raise forms.ValidationError("A package with that PyPI name already exists")
-            except PyPackage.DoesNotExist:
-                # this is the expected case
-                return slug
+            index_api_url = PyPackage._meta.get_field('index_api_url').default
+            # a miss asks the index, and someone is waiting on the answer
+            with ratelimit.interactive():
+                name = IndexName.objects.lookup(index_api_url, slug)
+            if name is None:
+                raise forms.ValidationError("No package with that name is on PyPI")
+            return name
 
     def save(self, force_insert=False, force_update=False, commit=True):
         m = super(PyPackageForm, self).save(commit=False)
@@ -0,0 +1,157 @@
+"""
+Timings and counters for the hot paths of talking to indexes and storing
+releases, sent to the sinks listed in ``PYPACKAGE_INSTRUMENTATION_SINKS``.
+
+Each timed block ``name`` reports its duration as the timing ``name`` and
+counts ``name.calls``, ``name.errors`` and, while Django logs queries (with
+DEBUG on), ``name.queries``.
+"""
+import logging
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import connection
+from django.utils.importlib import import_module
+
+from pypackage import conf
+
+
+class LoggingSink(object):
+    """
+    Logs every timing and counter at debug level.
+    """
+    def __init__(self, logger_name='pypackage.instrumentation'):
+        self.logger = logging.getLogger(logger_name)
+
+    def timing(self, name, seconds):
+        self.logger.debug("%s took %.1fms" % (name, seconds * 1000))
+
+    def incr(self, name, count=1):
+        self.logger.debug("%s +%d" % (name, count))
+
+
+class StatsdSink(object):
+    """
+    Sends timings and counters to a statsd server over UDP.
+    """
+    def __init__(self, host=None, port=None, prefix=None):
+        self.address = (host or conf.STATSD_HOST, port or conf.STATSD_PORT)
+        if prefix is None:
+            prefix = conf.STATSD_PREFIX
+        self.prefix = prefix
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def send(self, stat):
+        try:
+            self.socket.sendto(stat, self.address)
+        except socket.error:
+            # losing a stat is better than failing what was measured
+            pass
+
+    def timing(self, name, seconds):
+        self.send("%s%s:%d|ms" % (self.prefix, name, seconds * 1000))
+
+    def incr(self, name, count=1):
+        self.send("%s%s:%d|c" % (self.prefix, name, count))
+
+
+class MemorySink(object):
+    """
+    Keeps every timing and counter, for tests and ad hoc profiling.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timings = {}
+        self.counters = {}
+
+    def timing(self, name, seconds):
+        with self.lock:
+            self.timings.setdefault(name, []).append(seconds)
+
+    def incr(self, name, count=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + count
+
+    def histogram(self, name, buckets=(0.001, 0.01, 0.1, 1, 10)):
+        """
+        Return ``(upper bound, count)`` pairs for the timings of ``name``,
+        the last bound being None for anything slower.
+        """
+        counts = [0] * (len(buckets) + 1)
+        for seconds in self.timings.get(name, []):
+            for i, bound in enumerate(buckets):
+                if seconds <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+        return zip(list(buckets) + [None], counts)
+
+    def clear(self):
+        with self.lock:
+            self.timings.clear()
+            self.counters.clear()
+
+
+def load_sink(path):
+    module, attr = path.rsplit('.', 1)
+    return getattr(import_module(module), attr)()
+
+sinks = [load_sink(path) for path in conf.INSTRUMENTATION_SINKS]
+
+
+def timing(name, seconds):
+    for sink in sinks:
+        sink.timing(name, seconds)
+
+
+def incr(name, count=1):
+    for sink in sinks:
+        sink.incr(name, count)
+
+
+def _query_count():
+    if settings.DEBUG or getattr(connection, 'use_debug_cursor', False):
+        return len(connection.queries)
+    return None
+
+
+@contextmanager
+def timed(name, queries=True):
+    """
+    Time the block as ``name``.
+    """
+    if not sinks:
+        yield
+        return
+    started_queries = None
+    if queries:
+        started_queries = _query_count()
+    started = time.time()
+    try:
+        yield
+    except Exception:
+        incr(name + '.errors')
+        raise
+    finally:
+        timing(name, time.time() - started)
+        incr(name + '.calls')
+        if started_queries is not None:
+            incr(name + '.queries', _query_count() - started_queries)
+
+
+def instrumented(name):
+    """
+    Decorate a function to time each call to it as ``name``.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,252 @@
+"""
+An index backend using the PyPI JSON API.
+
+(see http://wiki.python.org/moin/PyPIJSON)
+
+A single package document lists every release of a package with its files,
+replacing both ``package_releases`` and every ``release_urls`` call. It only
+carries the full metadata of the latest release though, so older releases'
+metadata comes from their own documents, fetched concurrently.
+
+Documents are parsed incrementally with ijson when it is installed, keeping
+just the members we use, and with the standard json module otherwise.
+"""
+import json
+import socket
+import threading
+import time
+import urllib2
+
+try:
+    import ijson
+    from ijson.common import ObjectBuilder
+except ImportError:
+    ijson = None
+
+from pypackage import conf, ratelimit
+from pypackage.cache import index_cache
+from pypackage.client import retry_delay
+
+
+def read_document(stream):
+    """
+    Return the ``info`` and ``releases`` members of a JSON document read
+    from ``stream``.
+    """
+    if ijson is None:
+        document = json.load(stream)
+        return document.get('info') or {}, document.get('releases') or {}
+
+    info = {}
+    releases = {}
+    top_key = version = builder = None
+    depth = 0
+    for prefix, event, value in ijson.parse(stream):
+        if builder is not None:
+            builder.event(event, value)
+            if event in ('start_map', 'start_array'):
+                depth += 1
+            elif event in ('end_map', 'end_array'):
+                depth -= 1
+            if depth == 0:
+                if top_key == 'info':
+                    info = builder.value
+                else:
+                    releases[version] = builder.value
+                builder = None
+            continue
+        if prefix == '' and event == 'map_key':
+            top_key = value
+        elif prefix == 'releases' and event == 'map_key':
+            version = value
+        elif event in ('start_map', 'start_array') and (prefix == 'info' or
+                (top_key == 'releases' and prefix == 'releases.%s' % version)):
+            builder = ObjectBuilder()
+            builder.event(event, value)
+            depth = 1
+    return info, releases
+
+
+def release_data(info):
+    """
+    Shape a document's ``info`` like an XML-RPC ``release_data`` response.
+    """
+    # XML-RPC has no nulls, missing values come back as empty strings
+    data = dict((k, '' if v is None else v) for k, v in info.items())
+    data['_pypi_hidden'] = data.get('_pypi_hidden') or False
+    data['classifiers'] = data.get('classifiers') or []
+    return data
+
+
+def release_urls(files):
+    """
+    Shape a release's files like an XML-RPC ``release_urls`` response.
+    """
+    urls = []
+    for f in files:
+        f = dict(f)
+        # indexes no longer counting downloads report -1
+        f['downloads'] = max(0, f.get('downloads') or 0)
+        urls.append(f)
+    return urls
+
+
+class JSONBackend(object):
+    """
+    Talks to an index through its JSON API, found under ``index_api_url``.
+    """
+    def __init__(self, index_api_url):
+        self.index_api_url = index_api_url
+        self.base_url = index_api_url.rstrip('/')
+
+    def document(self, name, version=None, timeout=None):
+        """
+        Fetch a package's document, or a version's, trying again up to
+        ``PYPACKAGE_FETCH_RETRIES`` times with exponential backoff on
+        connection errors and server errors.
+        """
+        if timeout is None:
+            timeout = conf.FETCH_TIMEOUT
+        if version is None:
+            url = '%s/%s/json' % (self.base_url, name)
+        else:
+            url = '%s/%s/%s/json' % (self.base_url, name, version)
+        for attempt in range(conf.FETCH_RETRIES):
+            try:
+                return self._read(url, timeout)
+            except urllib2.HTTPError as e:
+                if e.code < 500:
+                    raise
+            except (urllib2.URLError, socket.error):
+                pass
+            time.sleep(retry_delay(attempt + 1))
+        return self._read(url, timeout)
+
+    def _read(self, url, timeout):
+        with ratelimit.limit(self.index_api_url):
+            stream = urllib2.urlopen(url, timeout=timeout)
+            try:
+                return read_document(stream)
+            finally:
+                stream.close()
+
+    def package_document(self, name, timeout=None):
+        """
+        Fetch the package document, caching what it tells us in the shape
+        of the XML-RPC responses it replaces.
+        """
+        try:
+            info, releases = self.document(name, timeout=timeout)
+        except urllib2.HTTPError as e:
+            if e.code != 404:
+                raise
+            info, releases = {}, {}
+        versions = releases.keys()
+        index_cache.set(self.index_api_url, 'package_releases',
+                (name, True), versions)
+        index_cache.set(self.index_api_url, 'package_releases',
+                (name, False), versions)
+        urls = {}
+        for version, files in releases.items():
+            urls[version] = release_urls(files)
+            index_cache.set(self.index_api_url, 'release_urls',
+                    (name, version), urls[version])
+        latest = {}
+        if info.get('version') in releases:
+            latest[info['version']] = release_data(info)
+            index_cache.set(self.index_api_url, 'release_data',
+                    (name, info['version']), latest[info['version']])
+        return versions, urls, latest
+
+    def package_releases(self, name, show_hidden=False, timeout=None,
+            use_cache=True):
+        if use_cache:
+            versions = index_cache.get(self.index_api_url, 'package_releases',
+                    name, show_hidden)
+            if versions is not None:
+                return versions
+        return self.package_document(name, timeout)[0]
+
+    def fetch_release_data(self, name, versions, workers=None, timeout=None,
+            batch_size=None, use_cache=True):
+        if workers is None:
+            workers = conf.FETCH_WORKERS
+        fetched = {}
+        failed = {}
+        data = {}
+        urls = {}
+        if use_cache:
+            for version in versions:
+                data[version] = index_cache.get(self.index_api_url,
+                        'release_data', name, version)
+                urls[version] = index_cache.get(self.index_api_url,
+                        'release_urls', name, version)
+        if [v for v in versions if urls.get(v) is None]:
+            try:
+                all_versions, all_urls, latest = self.package_document(name,
+                        timeout)
+            except Exception as e:
+                return fetched, dict((v, e) for v in versions)
+            urls.update(all_urls)
+            data.update(latest)
+
+        # only versions the index lists are worth a document of their own
+        pending = [v for v in versions
+                if data.get(v) is None and urls.get(v) is not None]
+        lock = threading.Lock()
+
+        def work():
+            while True:
+                with lock:
+                    if not pending:
+                        return
+                    version = pending.pop()
+                try:
+                    info, files = self.document(name, version, timeout)
+                except Exception as e:
+                    failed[version] = e
+                    continue
+                data[version] = release_data(info)
+                index_cache.set(self.index_api_url, 'release_data',
+                        (name, version), data[version])
+
+        threads = [threading.Thread(target=ratelimit.inherit(work))
+                for i in range(max(1, min(workers, len(pending))))]
+        for thread in threads:
+            thread.setDaemon(True)
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for version in versions:
+            if version in failed:
+                continue
+            if data.get(version) is None or urls.get(version) is None:
+                failed[version] = LookupError("%s %s is not on %s" %
+                        (name, version, self.index_api_url))
+                continue
+            fetched[version] = (data[version], urls[version])
+        return fetched, failed
+
+    def fetch_release_urls(self, name, versions, workers=None, timeout=None,
+            batch_size=None, use_cache=False):
+        urls = {}
+        if use_cache:
+            for version in versions:
+                urls[version] = index_cache.get(self.index_api_url,
+                        'release_urls', name, version)
+        if [v for v in versions if urls.get(v) is None]:
+            # a single document has the files of every release
+            try:
+                urls.update(self.package_document(name, timeout)[1])
+            except Exception as e:
+                return {}, dict((v, e) for v in versions)
+        fetched = {}
+        failed = {}
+        for version in versions:
+            if urls.get(version) is None:
+                failed[version] = LookupError("%s %s is not on %s" %
+                        (name, version, self.index_api_url))
+            else:
+                fetched[version] = urls[version]
+        return fetched, failed
@@ -0,0 +1,55 @@
+import json
+import time
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import NoArgsCommand
+from django.db import connection
+
+import pypackage
+from pypackage.benchmarks import runner
+
+
+class Command(NoArgsCommand):
+    help = ("Benchmark release ingestion and rendering against a local fake "
+            "index, in a throwaway test database, saving the results as "
+            "JSON.")
+    option_list = NoArgsCommand.option_list + (
+        make_option('--sizes', default='10,100,1000,5000',
+            help="Comma separated release counts of the synthetic packages."),
+        make_option('--description-size', type='int', default=20000,
+            help="Bytes in each release's description."),
+        make_option('--workers', type='int', default=None,
+            help="Worker threads used by fetch_releases."),
+        make_option('--repeat', type='int', default=20,
+            help="Times each read is repeated to average its latency."),
+        make_option('--output', default='pypackage-benchmark.json',
+            help="File the results are written to."),
+    )
+
+    def handle_noargs(self, **options):
+        verbosity = int(options.get('verbosity', 1))
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        old_name = settings.DATABASES['default']['NAME']
+        connection.creation.create_test_db(verbosity=0)
+        try:
+            results = runner.run(sizes, options['description_size'],
+                    options['workers'], options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        results['pypackage_version'] = pypackage.__version__
+        results['timestamp'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+        results['options'] = {'sizes': sizes,
+                'description_size': options['description_size'],
+                'workers': options['workers']}
+        output = open(options['output'], 'w')
+        try:
+            json.dump(results, output, indent=2, sort_keys=True)
+        finally:
+            output.close()
+        if verbosity:
+            for result in results['fetch_releases']:
+                self.stdout.write("fetch_releases of %(releases)d releases: "
+                        "%(seconds).2fs, %(queries)d queries\n" % result)
+            self.stdout.write("Results written to %s\n" % options['output'])
@@ -0,0 +1,33 @@
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pypackage import conf
+from pypackage.dump import import_dump, read_dump
+
+
+class Command(BaseCommand):
+    args = "<dump file>"
+    help = ("Seed packages and their releases from a local dump of an "
+            "index's metadata, a .jsonl or .sqlite file, without any network "
+            "access.")
+    option_list = BaseCommand.option_list + (
+        make_option('--index', dest='index_api_url',
+            default='http://pypi.python.org/pypi/',
+            help="Index url the imported packages are recorded as hosted on."),
+        make_option('--batch-size', dest='batch_size', type='int',
+            default=conf.BULK_SIZE,
+            help="Packages stored per transaction."),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError("Give the path of a single dump file.")
+        verbosity = int(options.get('verbosity', 1))
+        started = time.time()
+        packages, releases = import_dump(read_dump(args[0]),
+                options['index_api_url'], options['batch_size'])
+        if verbosity:
+            self.stdout.write("Imported %d releases of %d packages in %.1fs\n"
+                    % (releases, packages, time.time() - started))
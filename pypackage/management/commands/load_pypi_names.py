@@ -0,0 +1,29 @@
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from pypackage.models import IndexName, PyPackage
+
+
+class Command(BaseCommand):
+    help = ("Download the full list of package names on each index we use, "
+            "so adding packages doesn't need to ask the index whether they "
+            "exist. sync_pypi_changelog keeps the lists up to date after.")
+    option_list = BaseCommand.option_list + (
+        make_option('--index', dest='index_api_url', default=None,
+            help="Only load the names on this index url."),
+    )
+
+    def handle(self, *args, **options):
+        verbosity = int(options.get('verbosity', 1))
+        if options['index_api_url']:
+            index_api_urls = [options['index_api_url']]
+        else:
+            index_api_urls = set(PyPackage.objects.values_list(
+                    'index_api_url', flat=True))
+            index_api_urls.add(
+                    PyPackage._meta.get_field('index_api_url').default)
+        for index_api_url in index_api_urls:
+            count = IndexName.objects.load(index_api_url)
+            if verbosity:
+                self.stdout.write("%s: %d names\n" % (index_api_url, count))
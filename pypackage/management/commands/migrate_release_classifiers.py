@@ -0,0 +1,34 @@
+from django.core.management.base import NoArgsCommand
+from django.db import connection, transaction
+
+from pypackage import conf
+from pypackage.models import PyRelease
+
+
+class Command(NoArgsCommand):
+    help = ("Move release classifiers out of the old newline joined "
+            "PyRelease._classifiers column into the indexed classifier "
+            "tables. Drop the column by hand once this has run.")
+
+    def handle_noargs(self, **options):
+        verbosity = int(options.get('verbosity', 1))
+        qn = connection.ops.quote_name
+        table = qn(PyRelease._meta.db_table)
+        cursor = connection.cursor()
+        cursor.execute("SELECT id FROM %s WHERE _classifiers <> ''" % table)
+        pks = [row[0] for row in cursor.fetchall()]
+        for i in range(0, len(pks), conf.BULK_SIZE):
+            self.migrate(table, pks[i:i + conf.BULK_SIZE])
+        if verbosity:
+            self.stdout.write("Migrated the classifiers of %d releases\n" %
+                    len(pks))
+
+    @transaction.commit_on_success
+    def migrate(self, table, pks):
+        cursor = connection.cursor()
+        cursor.execute("SELECT id, _classifiers FROM %s WHERE id IN (%s)" %
+                (table, ', '.join(['%s'] * len(pks))), pks)
+        for pk, classifiers in cursor.fetchall():
+            release = PyRelease.objects.get(pk=pk)
+            release.classifiers = classifiers.split('\n')
+            release.save()
@@ -0,0 +1,36 @@
+from django.core.management.base import NoArgsCommand
+from django.db import connection, transaction
+
+from pypackage import conf
+from pypackage.models import PyRelease, ReleaseDescription
+
+
+class Command(NoArgsCommand):
+    help = ("Move release descriptions out of the old PyRelease.description "
+            "column into compressed, shared ReleaseDescription rows. Drop "
+            "the column by hand once this has run.")
+
+    def handle_noargs(self, **options):
+        verbosity = int(options.get('verbosity', 1))
+        qn = connection.ops.quote_name
+        table = qn(PyRelease._meta.db_table)
+        cursor = connection.cursor()
+        cursor.execute("SELECT id FROM %s WHERE description_blob_id IS NULL "
+                "AND description <> ''" % table)
+        pks = [row[0] for row in cursor.fetchall()]
+        for i in range(0, len(pks), conf.BULK_SIZE):
+            self.migrate(table, pks[i:i + conf.BULK_SIZE])
+        if verbosity:
+            self.stdout.write("Migrated %d descriptions\n" % len(pks))
+
+    @transaction.commit_on_success
+    def migrate(self, table, pks):
+        cursor = connection.cursor()
+        cursor.execute("SELECT id, description FROM %s WHERE id IN (%s)" %
+                (table, ', '.join(['%s'] * len(pks))), pks)
+        rows = cursor.fetchall()
+        descriptions = ReleaseDescription.objects.for_texts(
+                [description for pk, description in rows])
+        for pk, description in rows:
+            PyRelease.objects.filter(pk=pk).update(
+                    description_blob=descriptions[description])
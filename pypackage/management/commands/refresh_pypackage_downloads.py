@@ -0,0 +1,61 @@
+import threading
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from pypackage.models import PyPackage
+from pypackage.utils import run_in_pool
+
+
+class Command(BaseCommand):
+    args = "[name ...]"
+    help = ("Refresh the download counts of the releases already stored for "
+            "every PyPackage, or the named ones, without fetching their "
+            "metadata again. Cheap enough to run far more often than "
+            "refresh_pypackages.")
+    option_list = BaseCommand.option_list + (
+        make_option('--workers', type='int', default=8,
+            help="Number of packages refreshed at once."),
+        make_option('--index', dest='index_api_url', default=None,
+            help="Only refresh packages hosted on this index url."),
+    )
+
+    def handle(self, *names, **options):
+        verbosity = int(options.get('verbosity', 1))
+        pypackages = PyPackage.objects.all()
+        if names:
+            pypackages = pypackages.filter(name__in=names)
+        if options['index_api_url']:
+            pypackages = pypackages.filter(
+                    index_api_url=options['index_api_url'])
+        pending = list(pypackages.order_by('pk'))
+
+        lock = threading.Lock()
+        counts = {'packages': 0, 'releases': 0}
+        failures = []
+
+        def refresh(pypackage):
+            # parallelism comes from the package pool here
+            changed, failed = pypackage.refresh_downloads(workers=1)
+            with lock:
+                counts['packages'] += 1
+                counts['releases'] += changed
+                if failed:
+                    failures.append((pypackage.name,
+                            "%d versions failed" % len(failed)))
+
+        total = len(pending)
+        started = time.time()
+        errors = run_in_pool(refresh, pending, options['workers'])
+        failures.extend((pypackage.name, e) for pypackage, e in errors)
+        elapsed = time.time() - started
+
+        if verbosity:
+            self.stdout.write("Refreshed downloads of %d of %d packages in "
+                    "%.1fs, %d releases changed\n" % (counts['packages'],
+                    total, elapsed, counts['releases']))
+        if failures:
+            self.stdout.write("%d failures:\n" % len(failures))
+            for name, error in failures:
+                self.stdout.write("  %s: %s\n" % (name, error))
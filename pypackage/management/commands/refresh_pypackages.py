@@ -0,0 +1,86 @@
+import os
+import threading
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from pypackage.models import PyPackage
+from pypackage.utils import run_in_pool
+
+
+class Command(BaseCommand):
+    args = "[name ...]"
+    help = ("Fetch new releases for every PyPackage, or the named ones, "
+            "using a pool of worker threads. Progress is checkpointed so an "
+            "interrupted run can be resumed.")
+    option_list = BaseCommand.option_list + (
+        make_option('--workers', type='int', default=8,
+            help="Number of packages refreshed at once."),
+        make_option('--index', dest='index_api_url', default=None,
+            help="Only refresh packages hosted on this index url."),
+        make_option('--checkpoint', default='refresh_pypackages.checkpoint',
+            help="File recording the packages already refreshed."),
+        make_option('--resume', action='store_true', default=False,
+            help="Skip the packages recorded in the checkpoint file."),
+        make_option('--slowest', type='int', default=10,
+            help="Number of slowest packages to report."),
+    )
+
+    def handle(self, *names, **options):
+        pypackages = PyPackage.objects.all()
+        if names:
+            pypackages = pypackages.filter(name__in=names)
+        if options['index_api_url']:
+            pypackages = pypackages.filter(
+                    index_api_url=options['index_api_url'])
+
+        checkpoint = options['checkpoint']
+        done = set()
+        if options['resume'] and os.path.exists(checkpoint):
+            done = set(int(line) for line in open(checkpoint) if line.strip())
+        pending = [p for p in pypackages.order_by('pk') if p.pk not in done]
+
+        lock = threading.Lock()
+        timings = []
+        failures = []
+        checkpoint_file = open(checkpoint, options['resume'] and 'a' or 'w')
+
+        def refresh(pypackage):
+            started = time.time()
+            # parallelism comes from the package pool here
+            failed = pypackage.fetch_releases(workers=1)
+            with lock:
+                if failed:
+                    # leave it out of the checkpoint to be tried again
+                    failures.append((pypackage.name,
+                            "%d versions failed" % len(failed)))
+                    return
+                timings.append((time.time() - started, pypackage.name))
+                checkpoint_file.write("%d\n" % pypackage.pk)
+                checkpoint_file.flush()
+
+        total = len(pending)
+        started = time.time()
+        try:
+            errors = run_in_pool(refresh, pending, options['workers'])
+        finally:
+            checkpoint_file.close()
+        failures.extend((pypackage.name, e) for pypackage, e in errors)
+        elapsed = time.time() - started
+
+        if not failures and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+
+        self.stdout.write("Refreshed %d of %d packages in %.1fs "
+                "(%.2f packages/s), %d skipped as already done\n" %
+                (len(timings), total, elapsed, len(timings) / (elapsed or 1),
+                len(done)))
+        if failures:
+            self.stdout.write("%d failures:\n" % len(failures))
+            for name, error in failures:
+                self.stdout.write("  %s: %s\n" % (name, error))
+        if timings and options['slowest']:
+            self.stdout.write("Slowest packages:\n")
+            for seconds, name in sorted(timings, reverse=True)[:options['slowest']]:
+                self.stdout.write("  %s: %.1fs\n" % (name, seconds))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from pypackage import repourls
+from pypackage.models import PyPackage, PyRelease
+from pypackage.utils import version_sort_key
+
+
+class Command(BaseCommand):
+    args = "[name ...]"
+    help = ("Recompute the stored download totals and latest releases of "
+            "every PyPackage, or the named ones, filling in missing release "
+            "sort keys and repo urls first.")
+
+    def handle(self, *names, **options):
+        verbosity = int(options.get('verbosity', 1))
+        pypackages = PyPackage.objects.all()
+        if names:
+            pypackages = pypackages.filter(name__in=names)
+        releases = PyRelease.objects.filter(sort_key='',
+                pypackage__in=pypackages)
+        for pk, version in releases.values_list('pk', 'version'):
+            PyRelease.objects.filter(pk=pk).update(
+                    sort_key=version_sort_key(version))
+        releases = PyRelease.objects.filter(repo_url=None,
+                pypackage__in=pypackages)
+        for pk, home_page in releases.values_list('pk', 'home_page'):
+            PyRelease.objects.filter(pk=pk).update(
+                    repo_url=repourls.resolve(home_page))
+        count = 0
+        for pypackage in pypackages.iterator():
+            pypackage.update_totals()
+            count += 1
+        if verbosity:
+            self.stdout.write("Repaired %d packages\n" % count)
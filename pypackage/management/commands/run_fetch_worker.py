@@ -0,0 +1,31 @@
+import time
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+
+from pypackage.models import FetchJob
+
+
+class Command(NoArgsCommand):
+    help = ("Run the release fetches queued by web requests when "
+            "PYPACKAGE_ASYNC_FETCH is on.")
+    option_list = NoArgsCommand.option_list + (
+        make_option('--once', action='store_true', default=False,
+            help="Exit once no job is due instead of waiting for more."),
+        make_option('--sleep', type='float', default=5,
+            help="Seconds to wait between checks for new jobs."),
+    )
+
+    def handle_noargs(self, **options):
+        verbosity = int(options.get('verbosity', 1))
+        while True:
+            job = FetchJob.objects.claim()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['sleep'])
+                continue
+            succeeded = job.run()
+            if verbosity:
+                self.stdout.write("%s: %s\n" %
+                        (job, succeeded and "done" or "failed"))
@@ -0,0 +1,19 @@
+from django.core.management.base import NoArgsCommand
+
+from pypackage.models import PyPackage
+from pypackage.sync import sync_index
+
+
+class Command(NoArgsCommand):
+    help = ("Refresh the releases of tracked packages that changed on their "
+            "index since the last sync.")
+
+    def handle_noargs(self, **options):
+        verbosity = int(options.get('verbosity', 1))
+        index_api_urls = PyPackage.objects.values_list('index_api_url',
+                flat=True).distinct()
+        for index_api_url in index_api_urls:
+            updated = sync_index(index_api_url)
+            if verbosity:
+                self.stdout.write("%s: %d packages updated\n" %
+                        (index_api_url, len(updated)))
@@ -1,16 +1,24 @@
+import base64
+import hashlib
 import locale
-import re
-import xmlrpclib
+import logging
+import traceback
+import zlib
+from datetime import date, datetime, timedelta
 
-from django.db import models
-from django.db.models import Sum
+from django.db import models, transaction
+from django.db.models import Count, F, Q, Sum
 from django.template.defaultfilters import slugify
 from django.utils.translation import ugettext_lazy as _
 
-from package import repos
 from package.models import Package, Version
 from package.signals import signal_fetch_latest_metadata
-from package.utils import get_version
+from pypackage import client, conf, repourls
+from pypackage.instrumentation import instrumented, timed
+from pypackage.utils import (bulk_get, bulk_insert, bulk_update,
+        version_sort_key)
+
+logger = logging.getLogger(__name__)
 
 locale.setlocale(locale.LC_ALL, '')
 
@@ -20,14 +28,53 @@ def handle_fetch_metada_signal(**kwargs):
         pypackage = PyPackage.objects.get(packaginator_package=sending_package)
     except PyPackage.DoesNotExist:
         return False
-    pypackage.fetch_releases()
+    # the page asking for fresh data shouldn't be served cached fragments
+    pypackage.bump_data_version()
+    if conf.ASYNC_FETCH:
+        FetchJob.objects.enqueue(pypackage)
+    else:
+        pypackage.fetch_releases()
 
 signal_fetch_latest_metadata.connect(handle_fetch_metada_signal)
 
+# fields of a stored release left alone when refreshing it from the index
+RELEASE_IDENTITY_FIELDS = ('id', 'created', 'packaginator_version',
+        'pypackage', 'version')
+
 class PypiVersion(object):
     def __init__(self, release_data):
         self.__dict__.update(release_data)
 
+def clean_release_data(data, urls):
+    """
+    Return copies of a version's ``release_data`` and ``release_urls`` fit
+    for storing: text as strings no longer than their columns, classifiers
+    as a list of strings and download counts as numbers of at least zero.
+    """
+    data = dict(data)
+    for field in PyRelease._meta.fields:
+        if field.name not in data or not isinstance(field,
+                (models.CharField, models.TextField)):
+            continue
+        value = data[field.name]
+        if value is None:
+            value = u''
+        elif not isinstance(value, basestring):
+            value = unicode(value)
+        if isinstance(field, models.CharField):
+            value = value[:field.max_length]
+        data[field.name] = value
+    data.setdefault('license', u'')
+    data['_pypi_hidden'] = bool(data.get('_pypi_hidden'))
+    data['classifiers'] = [c.strip() for c in data.get('classifiers') or []
+            if isinstance(c, basestring)]
+    cleaned_urls = []
+    for url in urls or []:
+        url = dict(url)
+        url['downloads'] = max(0, int(url.get('downloads') or 0))
+        cleaned_urls.append(url)
+    return data, cleaned_urls
+
 class PyPackageManager(models.Manager):
     def create_with_package(self, *args, **kwargs):
         package, created = Package.objects.get_or_create(
@@ -35,10 +82,45 @@ class PyPackageManager(models.Manager):
                 slug=slugify(kwargs['name']))
         kwargs['packaginator_package'] = package
         pypackage = super(PyPackageManager, self).create(*args, **kwargs)
-        pypackage.fetch_releases()
-        package.repo_description = pypackage.latest.summary
-        package.repo_url = pypackage.lookup_repo_url()
-        package.save()
+        if conf.ASYNC_FETCH:
+            FetchJob.objects.enqueue(pypackage, update_package=True)
+        else:
+            pypackage.fetch_releases()
+            pypackage.update_packaginator_package()
+        return pypackage
+
+    def with_classifier(self, name):
+        """
+        The packages whose latest release has the classifier ``name``.
+        """
+        return self.filter(
+                latest_release__release_classifiers__classifier__name=name)
+
+    def attach_to(self, packages, releases=True):
+        """
+        Set ``pypi`` on each of ``packages`` to its PyPackage, with the latest
+        release already loaded unless ``releases`` is False, using a single
+        query so lists of packages can show their PyPI data without a query
+        per row. Packages that aren't on an index get ``None``.
+        """
+        packages = list(packages)
+        if not packages:
+            return packages
+        pypackages = self.filter(
+                packaginator_package__in=[p.pk for p in packages])
+        if releases:
+            pypackages = pypackages.select_related('latest_release').defer(
+                    *['latest_release__%s' % f for f in RELEASE_HEAVY_FIELDS])
+        by_package = dict((p.packaginator_package_id, p) for p in pypackages)
+        pypi_cache = Package.pypi.related.get_cache_name()
+        package_cache = self.model._meta.get_field(
+                'packaginator_package').get_cache_name()
+        for package in packages:
+            pypackage = by_package.get(package.pk)
+            if pypackage is not None:
+                setattr(pypackage, package_cache, package)
+            setattr(package, pypi_cache, pypackage)
+        return packages
 
 
 class PyPackage(models.Model):
@@ -52,6 +134,18 @@ class PyPackage(models.Model):
     name = models.CharField(max_length=255, unique=True, editable=False)
     index_api_url = models.URLField(verify_exists=False, max_length=200,
             default="http://pypi.python.org/pypi/")
+    # kept up to date by update_totals whenever releases are written
+    total_downloads = models.IntegerField(_("downloads"), default=0,
+            db_index=True, editable=False)
+    latest_release = models.ForeignKey('PyRelease', null=True, blank=True,
+            editable=False, related_name='latest_of',
+            on_delete=models.SET_NULL)
+    # bumped whenever the releases change, so cached fragments showing them
+    # can be keyed by it
+    data_version = models.IntegerField(default=0, editable=False)
+    # downloads gained over the last GROWTH_DAYS, kept up by update_totals
+    downloads_growth = models.IntegerField(default=0, db_index=True,
+            editable=False)
 
     objects = PyPackageManager()
     def __unicode__(self):
@@ -59,6 +153,8 @@ class PyPackage(models.Model):
 
     @property
     def latest(self):
+        if self.latest_release_id:
+            return self.latest_release
         try:
             return self.releases.latest()
         except PyRelease.DoesNotExist:
@@ -66,16 +162,84 @@ class PyPackage(models.Model):
 
     @property
     def downloads(self):
-        return self.releases.filter(hidden=False).aggregate(Sum('downloads'))['downloads__sum'] or 0
+        return self.total_downloads
+
+    @property
+    def backend(self):
+        return client.get_backend(self.index_api_url)
+
+    def release_history(self, cursor=None, limit=None, include_hidden=False):
+        """
+        Return a page of up to ``limit`` releases, newest first, starting
+        after ``cursor``, as a dict of ``releases`` and the ``next`` page's
+        cursor, None on the last page.
+
+        Releases are dicts of just the fields listings show, and each page
+        costs one indexed query however long the history. Raises ValueError
+        for a malformed cursor.
+        """
+        if limit is None:
+            limit = conf.RELEASE_PAGE_SIZE
+        releases = self.releases.all()
+        if not include_hidden:
+            releases = releases.filter(hidden=False)
+        if cursor:
+            sort_key, pk = cursor.rsplit('-', 1)
+            pk = int(pk)
+            releases = releases.filter(Q(sort_key__lt=sort_key) |
+                    Q(sort_key=sort_key, pk__lt=pk))
+        rows = list(releases.order_by('-sort_key', '-pk').values(
+                *RELEASE_HISTORY_FIELDS)[:limit + 1])
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = '%s-%s' % (rows[-1]['sort_key'], rows[-1]['pk'])
+        return {'releases': rows, 'next': next_cursor}
 
+    def update_totals(self):
+        """
+        Recompute the stored download total and latest release from the
+        releases in the database, bumping the data version, and record the
+        total as today's in the package's download history.
+        """
+        self.total_downloads = self.releases.filter(hidden=False).aggregate(
+                Sum('downloads'))['downloads__sum'] or 0
+        self.latest_release = self.releases.latest()
+        self.data_version += 1
+        self.downloads_growth = DailyDownloads.objects.record(self,
+                self.total_downloads)
+        PyPackage.objects.filter(pk=self.pk).update(
+                total_downloads=self.total_downloads,
+                latest_release=self.latest_release,
+                data_version=F('data_version') + 1,
+                downloads_growth=self.downloads_growth)
+
+    def update_growth(self):
+        """
+        Recompute the downloads gained over the last GROWTH_DAYS, which
+        changes with the days even when the downloads don't.
+        """
+        growth = DailyDownloads.objects.growth(self, self.total_downloads)
+        if growth != self.downloads_growth:
+            self.downloads_growth = growth
+            PyPackage.objects.filter(pk=self.pk).update(
+                    downloads_growth=growth)
+
+    def bump_data_version(self):
+        """
+        Invalidate the cached fragments showing this package's releases.
+        """
+        self.data_version += 1
+        PyPackage.objects.filter(pk=self.pk).update(
+                data_version=F('data_version') + 1)
+
+    @instrumented('pypackage.save')
     def save(self, *args, **kwargs):
         if not self.name:
             self.name = self.packaginator_package.title
         if not self.id:
-            # first save, make sure we have releases
-            proxy = xmlrpclib.Server(self.index_api_url)
-            releases = proxy.package_releases(self.name)
-            if not releases:
+            # first save, make sure the index has it
+            if IndexName.objects.lookup(self.index_api_url, self.name) is None:
                 raise ValueError(
                         "No package named %s could be found indexed at %s" %
                         (self.name, self.index_api_url))
@@ -83,104 +247,384 @@ class PyPackage(models.Model):
         # TODO do we fetch releases on save?
         return super(PyPackage, self).save(*args, **kwargs)
 
+    def update_packaginator_package(self):
+        """
+        Fill in the packaginator package's description and repo from the
+        latest release.
+        """
+        package = self.packaginator_package
+        package.repo_description = self.latest.summary
+        package.repo_url = self.lookup_repo_url()
+        package.save()
+
+    @instrumented('pypackage.lookup_repo_url')
     def lookup_repo_url(self, version=None):
         if version:
             release = self.releases.get(version=version)
         else:
             release = self.latest
-        handler = repos.get_repo_for_repo_url(release.home_page)
-        if isinstance(handler, repos.unsupported.UnsupportedHandler):
-            return ''
-        elif isinstance(handler, repos.github.GitHubHandler):
-            repo_pattern = '((?:http|https|git)://github.com/[^/]*/[^/]*)/{0,1}'
-            match = re.match(repo_pattern, release.home_page)
-            if match and match.group(1):
-                return match.group(1)
-        else:
-            # only github is special cased for now
-            return release.home_page
+        if release.repo_url is None:
+            # stored before repo urls were resolved on the way in
+            release.repo_url = repourls.resolve(release.home_page)
+            PyRelease.objects.filter(pk=release.pk).update(
+                    repo_url=release.repo_url)
+        return release.repo_url
+
+    @instrumented('pypackage.fetch_releases')
+    def fetch_releases(self, include_hidden=True, workers=None, timeout=None):
+        """
+        Create a release for each version on the index we don't know yet.
 
-    def fetch_releases(self, include_hidden=True):
+        This runs in stages. Release metadata is fetched concurrently by up
+        to ``workers`` threads, each index call abandoned after ``timeout``
+        seconds and retried on failure. It is then cleaned up, and written
+        in chunks of ``PYPACKAGE_STORE_CHUNK_SIZE`` versions, each in its
+        own transaction. A version failing at any stage doesn't hold back
+        the others; it is recorded as a ReleaseFailure and tried again by
+        the next fetch.
+
+        Returns a dict mapping each version that failed to the error raised.
+        """
 
         package_name = self.name
-        proxy = xmlrpclib.Server(self.index_api_url)
-        releases = proxy.package_releases(package_name, include_hidden)
+        with timed('pypackage.fetch_releases.list'):
+            releases = self.backend.package_releases(package_name,
+                    include_hidden, timeout=timeout)
 
         if not releases:
             # TODO is this an error?
             pass
 
-        for version in releases:
+        # if we have a release already - skip it
+        known_versions = set(self.releases.values_list('version', flat=True))
+        new_versions = [v for v in releases if v not in known_versions]
+
+        with timed('pypackage.fetch_releases.fetch'):
+            fetched, failed = self._fetch(new_versions, workers, timeout)
+        with timed('pypackage.fetch_releases.clean'):
+            fetched = self._clean(fetched, failed)
+        with timed('pypackage.fetch_releases.store'):
+            versions = sorted(fetched, key=version_sort_key)
+            for i in range(0, len(versions), conf.STORE_CHUNK_SIZE):
+                chunk = versions[i:i + conf.STORE_CHUNK_SIZE]
+                try:
+                    self.store_releases(dict((v, fetched[v]) for v in chunk))
+                except Exception as e:
+                    logger.exception("Could not store %s %s" %
+                            (self.name, ', '.join(chunk)))
+                    failed.update(dict.fromkeys(chunk, e))
+        if not fetched:
+            # update_totals didn't run to move the growth on
+            self.update_growth()
+        ReleaseFailure.objects.record(self, failed)
+        return failed
+
+    def update_releases(self, versions, workers=None, timeout=None):
+        """
+        Refresh just ``versions`` from the index, creating the releases we
+        don't have yet and updating the ones we do.
+
+        Returns a dict mapping each version that couldn't be fetched to the
+        error raised.
+        """
+        # we're told these changed, so don't trust cached responses
+        fetched, failed = self._fetch(list(versions), workers, timeout,
+                use_cache=False)
+        fetched = self._clean(fetched, failed)
+        existing = dict((r.version, r) for r in
+                self.releases.filter(version__in=fetched.keys()))
+        self.store_releases(dict((v, fetched[v]) for v in fetched
+                if v not in existing))
+        changed = {}
+        for version, release in existing.items():
+            data, urls = fetched[version]
+            fresh = self.release_from_data(version, data, urls)
+            if fresh.downloads != release.downloads:
+                changed[release.pk] = fresh.downloads
+            for field in release._meta.fields:
+                if field.name not in RELEASE_IDENTITY_FIELDS:
+                    setattr(release, field.attname,
+                            getattr(fresh, field.attname))
+            release.description = fresh.description
+            release.classifiers = fresh.classifiers
+            release.save()
+            Version.objects.filter(pk=release.packaginator_version_id
+                    ).update(license=release.license)
+        DownloadSnapshot.objects.record(changed)
+        self.update_totals()
+        return failed
+
+    @instrumented('pypackage.refresh_downloads')
+    @transaction.commit_on_success
+    def refresh_downloads(self, workers=None, timeout=None):
+        """
+        Bring the download counts of the releases we already have up to date,
+        fetching only their files from the index and writing just the counts
+        that changed.
+
+        Returns a ``(changed, failed)`` pair: the number of releases updated
+        and a dict mapping each version that couldn't be fetched to the error
+        raised.
+        """
+        stored = dict((version, (pk, downloads)) for pk, version, downloads
+                in self.releases.values_list('pk', 'version', 'downloads'))
+        if not stored:
+            return 0, {}
+        fetched, failed = self.backend.fetch_release_urls(self.name,
+                stored.keys(), workers=workers, timeout=timeout,
+                use_cache=False)
+        for version, error in failed.items():
+            logger.warning("Could not fetch %s %s downloads from %s: %s" %
+                    (self.name, version, self.index_api_url, error))
+        changed = {}
+        for version, urls in fetched.items():
+            pk, downloads = stored[version]
+            fresh = sum(u['downloads'] for u in urls)
+            if fresh != downloads:
+                changed[pk] = fresh
+        if changed:
+            bulk_update(PyRelease, 'downloads', changed)
+            DownloadSnapshot.objects.record(changed)
+            self.update_totals()
+        else:
+            self.update_growth()
+        return len(changed), failed
+
+    def _fetch(self, versions, workers=None, timeout=None, use_cache=True):
+        fetched, failed = self.backend.fetch_release_data(self.name,
+                versions, workers=workers, timeout=timeout,
+                use_cache=use_cache)
+        for version, error in failed.items():
+            logger.warning("Could not fetch %s %s from %s: %s" %
+                    (self.name, version, self.index_api_url, error))
+        return fetched, failed
+
+    def _clean(self, fetched, failed):
+        cleaned = {}
+        for version, (data, urls) in fetched.items():
             try:
-                this_release = self.releases.get(version=version)
-                # if we have a release already - skip it
-                continue
-            except PyRelease.DoesNotExist:
-                # if we don't have a release, create it now
-                pass
-            release_data = PypiVersion(proxy.release_data
-                    (package_name, version))
-            release_data.hidden = release_data._pypi_hidden
-            release_data.downloads = 0
-            for download in proxy.release_urls(package_name, version):
-                release_data.downloads +=  download["downloads"]
-            if release_data.license == None or 'UNKNOWN' == release_data.license.upper():
-                for classifier in release_data.classifiers:
-                    if classifier.startswith('License'):
-                        # Do it this way to cover people not quite following the spec
-                        # at http://docs.python.org/distutils/setupscript.html#additional-meta-data
-                        release_data.license = classifier.replace('License ::', '')
-                        release_data.license = release_data.license.replace('OSI Approved :: ', '')
-                        break
-
-            if release_data.license and len(release_data.license) > 100:
-                release_data.license = "Other (see http://pypi.python.org/pypi/%s)" % package_name
-
-            packaginator_version, created = Version.objects.get_or_create(
-                    package=self.packaginator_package,
-                    number=version)
-            packaginator_version.license = release_data.license
-            packaginator_version.save()
-
-
-            this_release = self.releases.create(
-                packaginator_version = packaginator_version,
-                hidden = release_data.hidden,
-                )
-            for attr in release_data.__dict__:
-                if attr == 'classifiers':
-                    this_release._classifiers ='\n'.join(getattr(release_data, attr))
-                    continue
-
-                if hasattr(this_release, attr):
-                    val = getattr(release_data, attr)
-                    if val:
-                        setattr(this_release, attr, val)
-            this_release.save()
+                cleaned[version] = clean_release_data(data, urls)
+            except Exception as e:
+                logger.warning("Could not clean up %s %s from %s: %s" %
+                        (self.name, version, self.index_api_url, e))
+                failed[version] = e
+        return cleaned
+
+    def release_from_data(self, version, data, urls):
+        """
+        Build an unsaved release from the index's ``release_data`` and
+        ``release_urls`` for ``version``.
+        """
+        release_data = PypiVersion(data)
+        release_data.hidden = release_data._pypi_hidden
+        release_data.downloads = 0
+        for download in urls:
+            release_data.downloads +=  download["downloads"]
+        if not release_data.license or release_data.license.upper() == 'UNKNOWN':
+            for classifier in release_data.classifiers:
+                if classifier.startswith('License'):
+                    # Do it this way to cover people not quite following the spec
+                    # at http://docs.python.org/distutils/setupscript.html#additional-meta-data
+                    release_data.license = classifier.replace('License ::', '')
+                    release_data.license = release_data.license.replace('OSI Approved :: ', '')
+                    break
+
+        if release_data.license and len(release_data.license) > 100:
+            release_data.license = "Other (see http://pypi.python.org/pypi/%s)" % self.name
+
+        release = PyRelease(pypackage=self, version=version,
+                sort_key=version_sort_key(version),
+                hidden=release_data.hidden,
+                repo_url=repourls.resolve(getattr(release_data, 'home_page',
+                '')))
+        for attr in release_data.__dict__:
+            if hasattr(release, attr):
+                val = getattr(release_data, attr)
+                if val:
+                    setattr(release, attr, val)
+        return release
+
+    @transaction.commit_on_success
+    def store_releases(self, fetched):
+        """
+        Write the releases in ``fetched``, a dict mapping a version to its
+        ``(release_data, release_urls)``, along with their packaginator
+        versions, in a single transaction and a constant number of queries.
+        """
+        return self._store_releases(fetched)
+
+    # store_releases for callers managing their own transaction
+    def _store_releases(self, fetched):
+        releases = [self.release_from_data(version, data, urls)
+                for version, (data, urls) in fetched.items()]
+        if not releases:
+            return []
+
+        package_versions = Version.objects.filter(
+                package=self.packaginator_package)
+        existing = dict((v.number, v) for v in package_versions)
+
+        new_versions = []
+        relicensed = {}
+        for release in releases:
+            if release.version in existing:
+                packaginator_version = existing[release.version]
+                if packaginator_version.license != release.license:
+                    relicensed.setdefault(release.license, []).append(
+                            packaginator_version.pk)
+            else:
+                new_versions.append(Version(
+                        package=self.packaginator_package,
+                        number=release.version,
+                        license=release.license))
+        for license, pks in relicensed.items():
+            Version.objects.filter(pk__in=pks).update(license=license)
+
+        if new_versions:
+            bulk_insert(Version, new_versions)
+            existing = dict((v.number, v) for v in package_versions.all())
+        descriptions = ReleaseDescription.objects.for_texts(
+                [r.description for r in releases if r.description])
+        for release in releases:
+            release.packaginator_version = existing[release.version]
+            release.description_blob = descriptions.get(release.description)
+            release._description_changed = False
+            # linked in bulk below rather than by each save
+            release._classifiers_changed = False
+        bulk_insert(PyRelease, releases)
+        # bulk inserts don't tell us the new primary keys
+        release_pks = dict(self.releases.values_list('version', 'pk'))
+        self._link_classifiers(releases, release_pks)
+        DownloadSnapshot.objects.record(dict((release_pks[r.version],
+                r.downloads) for r in releases), replace=False)
+        self.update_totals()
+        return releases
+
+    def _link_classifiers(self, releases, release_pks):
+        classifiers = Classifier.objects.for_names(
+                set(n for r in releases for n in r.classifiers))
+        if not classifiers:
+            return
+        bulk_insert(ReleaseClassifier, [ReleaseClassifier(
+                release_id=release_pks[r.version],
+                classifier=classifiers[name])
+                for r in releases for name in r.classifiers])
+
+# text fields only needed when showing a single release in full
+RELEASE_HEAVY_FIELDS = ('keywords',)
+
+# the fields release_history loads
+RELEASE_HISTORY_FIELDS = ('pk', 'sort_key', 'version', 'license', 'downloads',
+        'hidden', 'created')
 
 class ReleaseManager(models.Manager):
 
+    # lazy, its query is timed where it runs, as in latest()
     def by_version(self):
-        qs = self.get_query_set()
-        return sorted(qs,key=lambda r: get_version(r.version))
+        return self.get_query_set().defer(*RELEASE_HEAVY_FIELDS).order_by(
+                'sort_key', 'pk')
 
+    @instrumented('releases.latest')
     def latest(self):
-        by_version = self.by_version()
-        if by_version:
-            return by_version[-1]
-        else:
+        try:
+            return self.by_version().reverse()[0]
+        except IndexError:
             return None
 
+class ClassifierManager(models.Manager):
+
+    def for_names(self, names):
+        """
+        Return a dict mapping each of ``names`` to its classifier, storing
+        the ones we don't have yet, in batched queries.
+        """
+        names = set(names)
+        stored = bulk_get(self.model, 'name', names)
+        missing = [Classifier(name=n) for n in names if n not in stored]
+        if missing:
+            bulk_insert(Classifier, missing)
+            stored = bulk_get(self.model, 'name', names)
+        return stored
+
+    def license_facets(self):
+        """
+        Return the license classifiers of the latest releases of our
+        packages, each annotated with its number of ``packages``, most used
+        first.
+        """
+        return self.filter(name__startswith='License ::').annotate(
+                packages=Count('release_classifiers__release__latest_of')
+                ).filter(packages__gt=0).order_by('-packages', 'name')
+
+class Classifier(models.Model):
+    """
+    A trove classifier, such as "Framework :: Django", stored once.
+    """
+    name = models.CharField(max_length=255, unique=True)
+
+    objects = ClassifierManager()
+
+    def __unicode__(self):
+        return self.name
+
+class ReleaseDescriptionManager(models.Manager):
+
+    def for_texts(self, texts):
+        """
+        Return a dict mapping each of ``texts`` to its stored description,
+        storing the ones we don't have yet, in batched queries.
+        """
+        by_digest = dict((ReleaseDescription.digest_of(t), t) for t in texts)
+        stored = bulk_get(self.model, 'digest', by_digest.keys())
+        missing = [ReleaseDescription(digest=d,
+                data=ReleaseDescription.compress(t))
+                for d, t in by_digest.items() if d not in stored]
+        if missing:
+            bulk_insert(ReleaseDescription, missing)
+            stored = bulk_get(self.model, 'digest', by_digest.keys())
+        return dict((t, stored[d]) for d, t in by_digest.items())
+
+class ReleaseDescription(models.Model):
+    """
+    A long description, stored compressed and only once however many
+    releases share it.
+    """
+    digest = models.CharField(max_length=40, unique=True)
+    # zlib compressed utf-8, base64 encoded to suit any text column
+    data = models.TextField()
+
+    objects = ReleaseDescriptionManager()
+
+    def __unicode__(self):
+        return self.digest
+
+    @staticmethod
+    def digest_of(text):
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def compress(text):
+        return base64.b64encode(zlib.compress(text.encode('utf-8')))
+
+    @property
+    def text(self):
+        return zlib.decompress(base64.b64decode(self.data)).decode('utf-8')
+
 class PyRelease(models.Model):
     author = models.CharField(max_length=128, blank=True)
     author_email = models.EmailField(max_length=75, blank=True)
-    _classifiers = models.TextField(blank=True)
     created = models.DateTimeField(auto_now_add=True, editable=False)
-    description = models.TextField(blank=True)
+    # read and written through the description property
+    description_blob = models.ForeignKey(ReleaseDescription, null=True,
+            blank=True, editable=False, related_name='releases',
+            on_delete=models.SET_NULL)
     download_url = models.URLField(verify_exists=False, max_length=200, blank=True)
     downloads = models.IntegerField(_("downloads"), default=0)
     hidden = models.BooleanField(default=False)
     home_page = models.URLField(verify_exists=False, max_length=200, blank=True)
+    # resolved from home_page when stored, None if stored before that was done
+    repo_url = models.URLField(verify_exists=False, max_length=200, null=True,
+            blank=True, editable=False)
     keywords = models.TextField(blank=True)
     license = models.CharField(max_length=128, blank=True)
     maintainer = models.CharField(max_length=128)
@@ -196,6 +640,7 @@ class PyRelease(models.Model):
     stable_version = models.CharField(max_length=128, blank=True)
     summary = models.TextField(blank=True)
     version = models.CharField(max_length=128, editable=False)
+    sort_key = models.CharField(max_length=255, db_index=True, editable=False)
 
     objects = ReleaseManager()
 
@@ -211,11 +656,377 @@ class PyRelease(models.Model):
     def __unicode__(self):
         return self.release_name
 
+    def save(self, *args, **kwargs):
+        if not self.sort_key:
+            self.sort_key = version_sort_key(self.version)
+        if getattr(self, '_description_changed', False):
+            self.description_blob = None
+            if self._description:
+                self.description_blob = ReleaseDescription.objects.for_texts(
+                        [self._description])[self._description]
+            self._description_changed = False
+        super(PyRelease, self).save(*args, **kwargs)
+        if getattr(self, '_classifiers_changed', False):
+            self.release_classifiers.all().delete()
+            classifiers = Classifier.objects.for_names(self._classifiers)
+            bulk_insert(ReleaseClassifier, [ReleaseClassifier(release=self,
+                    classifier=classifiers[name])
+                    for name in self._classifiers])
+            self._classifiers_changed = False
+
+    def _get_description(self):
+        if not hasattr(self, '_description'):
+            self._description = u''
+            if self.description_blob_id:
+                self._description = self.description_blob.text
+        return self._description
+
+    def _set_description(self, text):
+        self._description = text or u''
+        self._description_changed = True
+
+    # only loaded and decompressed when asked for
+    description = property(_get_description, _set_description)
+
     @property
     def release_name(self):
         return u"%s-%s" % (self.pypackage.name, self.version)
 
-    @property
-    def classifiers(self):
-        return self._classifiers.split('\n')
+    def _get_classifiers(self):
+        if not hasattr(self, '_classifiers'):
+            self._classifiers = []
+            if self.pk:
+                self._classifiers = list(Classifier.objects.filter(
+                        release_classifiers__release=self).order_by(
+                        'release_classifiers__pk').values_list('name',
+                        flat=True))
+        return self._classifiers
+
+    def _set_classifiers(self, names):
+        self._classifiers = []
+        for name in names or []:
+            if name and name not in self._classifiers:
+                self._classifiers.append(name)
+        self._classifiers_changed = True
 
+    classifiers = property(_get_classifiers, _set_classifiers)
+
+class ReleaseClassifier(models.Model):
+    release = models.ForeignKey(PyRelease,
+            related_name='release_classifiers')
+    classifier = models.ForeignKey(Classifier,
+            related_name='release_classifiers')
+
+    class Meta:
+        unique_together = ('release', 'classifier')
+
+
+class ReleaseFailureManager(models.Manager):
+
+    def record(self, pypackage, failed):
+        """
+        Record the versions of ``pypackage`` in ``failed``, a dict mapping a
+        version to its error, as the ones its last fetch couldn't store.
+        """
+        self.filter(pypackage=pypackage).exclude(
+                version__in=list(failed)).delete()
+        for version, error in failed.items():
+            if not self.filter(pypackage=pypackage, version=version).update(
+                    error=unicode(error), attempts=F('attempts') + 1,
+                    last_attempt=datetime.now()):
+                self.create(pypackage=pypackage, version=version,
+                        error=unicode(error))
+
+class ReleaseFailure(models.Model):
+    """
+    A version of a package the last fetch couldn't store.
+    """
+    pypackage = models.ForeignKey(PyPackage, related_name='release_failures')
+    version = models.CharField(max_length=128)
+    error = models.TextField(blank=True)
+    attempts = models.IntegerField(default=1)
+    last_attempt = models.DateTimeField(default=datetime.now)
+
+    objects = ReleaseFailureManager()
+
+    class Meta:
+        unique_together = ('pypackage', 'version')
+
+    def __unicode__(self):
+        return u"%s-%s" % (self.pypackage.name, self.version)
+
+
+class DownloadSnapshotManager(models.Manager):
+
+    def record(self, counts, replace=True):
+        """
+        Record ``counts``, a dict mapping a release's primary key to its
+        download count, as today's, replacing any taken earlier today
+        unless ``replace`` is False.
+        """
+        if not counts:
+            return
+        today = date.today()
+        if replace:
+            pks = list(counts)
+            for i in range(0, len(pks), conf.BULK_SIZE):
+                self.filter(day=today,
+                        release__in=pks[i:i + conf.BULK_SIZE]).delete()
+        bulk_insert(DownloadSnapshot, [DownloadSnapshot(release_id=pk,
+                day=today, downloads=downloads)
+                for pk, downloads in counts.items()])
+
+class DownloadSnapshot(models.Model):
+    """
+    A release's download count as of a day, only taken when it changed, so
+    the count on any day is that of the latest snapshot up to it.
+    """
+    release = models.ForeignKey(PyRelease, related_name='download_snapshots')
+    day = models.DateField(db_index=True)
+    downloads = models.IntegerField()
+
+    objects = DownloadSnapshotManager()
+
+    class Meta:
+        unique_together = ('release', 'day')
+        ordering = ['day']
+
+class DailyDownloadsManager(models.Manager):
+
+    def record(self, pypackage, downloads):
+        """
+        Record ``downloads`` as ``pypackage``'s total for today, returning
+        its growth as ``growth`` does.
+        """
+        today = date.today()
+        if not self.filter(pypackage=pypackage, day=today).update(
+                downloads=downloads):
+            self.create(pypackage=pypackage, day=today, downloads=downloads)
+        return self.growth(pypackage, downloads)
+
+    def growth(self, pypackage, downloads):
+        """
+        Return how many of its ``downloads`` ``pypackage`` gained over the
+        last ``PYPACKAGE_GROWTH_DAYS``, or since its first recorded total if
+        we haven't known it that long.
+        """
+        history = self.filter(pypackage=pypackage).values_list('downloads',
+                flat=True)
+        # totals are only recorded on days they changed, so the one standing
+        # at the start of the window is the latest before it
+        since = date.today() - timedelta(days=conf.GROWTH_DAYS)
+        baseline = list(history.filter(day__lte=since).order_by('-day')[:1])
+        if not baseline:
+            baseline = list(history.order_by('day')[:1]) or [downloads]
+        return downloads - baseline[0]
+
+    def between(self, pypackage, start, end):
+        """
+        The daily totals of ``pypackage`` from ``start`` to ``end``
+        inclusive, oldest first.
+        """
+        return self.filter(pypackage=pypackage,
+                day__range=(start, end)).order_by('day')
+
+class DailyDownloads(models.Model):
+    """
+    A package's total downloads at the end of a day it changed on.
+    """
+    pypackage = models.ForeignKey(PyPackage, related_name='daily_downloads')
+    day = models.DateField(db_index=True)
+    downloads = models.IntegerField()
+
+    objects = DailyDownloadsManager()
+
+    class Meta:
+        unique_together = ('pypackage', 'day')
+        verbose_name_plural = _(u"daily downloads")
+
+
+class IndexSync(models.Model):
+    """
+    How far through an index's changelog our releases are up to date.
+    """
+    index_api_url = models.URLField(verify_exists=False, max_length=200,
+            unique=True)
+    last_serial = models.IntegerField(null=True)
+    last_synced = models.DateTimeField(auto_now=True)
+
+    def __unicode__(self):
+        return u"%s@%s" % (self.index_api_url, self.last_serial)
+
+
+class IndexNameManager(models.Manager):
+
+    def lookup(self, index_api_url, name):
+        """
+        Return the index's spelling of ``name``, matched regardless of case,
+        or None if the index doesn't have it. Names we don't know are looked
+        up on the index itself, and remembered if found.
+        """
+        normalized = IndexName.normalize(name)
+        try:
+            return self.filter(index_api_url=index_api_url,
+                    normalized=normalized).values_list('name', flat=True)[0]
+        except IndexError:
+            pass
+        if not client.get_backend(index_api_url).package_releases(name):
+            return None
+        self.update_names(index_api_url, [name])
+        return name
+
+    @transaction.commit_on_success
+    def update_names(self, index_api_url, added=(), removed=()):
+        """
+        Remember the names in ``added`` and forget the ones in ``removed``.
+        """
+        self._update_names(index_api_url, added, removed)
+
+    # update_names for callers managing their own transaction
+    def _update_names(self, index_api_url, added=(), removed=()):
+        removed = set(IndexName.normalize(n) for n in removed)
+        if removed:
+            removed = list(removed)
+            for i in range(0, len(removed), conf.BULK_SIZE):
+                self.filter(index_api_url=index_api_url,
+                        normalized__in=removed[i:i + conf.BULK_SIZE]).delete()
+        added = dict((IndexName.normalize(n), n) for n in added)
+        known = set()
+        keys = list(added)
+        for i in range(0, len(keys), conf.BULK_SIZE):
+            known.update(self.filter(index_api_url=index_api_url,
+                    normalized__in=keys[i:i + conf.BULK_SIZE]).values_list(
+                    'normalized', flat=True))
+        bulk_insert(IndexName, [IndexName(index_api_url=index_api_url,
+                name=name, normalized=normalized)
+                for normalized, name in added.items()
+                if normalized not in known])
+
+    @transaction.commit_on_success
+    def load(self, index_api_url, timeout=None):
+        """
+        Replace the names we know for ``index_api_url`` with the index's
+        full ``list_packages``, returning how many there are.
+        """
+        names = client.call(index_api_url, 'list_packages', timeout=timeout,
+                use_cache=False)
+        listed = dict((IndexName.normalize(n), n) for n in names)
+        known = dict(self.filter(index_api_url=index_api_url).values_list(
+                'normalized', 'name'))
+        gone = [n for n in known if n not in listed]
+        for i in range(0, len(gone), conf.BULK_SIZE):
+            self.filter(index_api_url=index_api_url,
+                    normalized__in=gone[i:i + conf.BULK_SIZE]).delete()
+        bulk_insert(IndexName, [IndexName(index_api_url=index_api_url,
+                name=name, normalized=normalized)
+                for normalized, name in listed.items()
+                if normalized not in known])
+        return len(listed)
+
+class IndexName(models.Model):
+    """
+    A package name known to be on an index, so checking a name exists
+    doesn't need a round trip to the index.
+    """
+    index_api_url = models.URLField(verify_exists=False, max_length=200)
+    name = models.CharField(max_length=255)
+    normalized = models.CharField(max_length=255)
+
+    objects = IndexNameManager()
+
+    class Meta:
+        unique_together = ('index_api_url', 'normalized')
+
+    def __unicode__(self):
+        return self.name
+
+    @staticmethod
+    def normalize(name):
+        return name.lower()
+
+
+class FetchJobManager(models.Manager):
+
+    def enqueue(self, pypackage, update_package=False):
+        """
+        Ask for ``pypackage``'s releases to be fetched by a worker, merging
+        with any job already waiting for it.
+        """
+        job, created = self.get_or_create(pypackage=pypackage,
+                defaults={'update_package': update_package})
+        if not created:
+            changes = {'run_after': datetime.now(), 'attempts': 0}
+            if update_package:
+                changes['update_package'] = True
+            self.filter(pk=job.pk).update(**changes)
+        return job
+
+    def claim(self):
+        """
+        Lock the next job that is due for the calling worker, returning None
+        when there is nothing to do.
+        """
+        now = datetime.now()
+        due = self.filter(run_after__lte=now).filter(
+                Q(locked_until=None) | Q(locked_until__lt=now))
+        for job in due.order_by('run_after')[:10]:
+            locked_until = now + timedelta(seconds=conf.JOB_LEASE)
+            # another worker may have got there first
+            if self.filter(pk=job.pk, locked_until=job.locked_until).update(
+                    locked_until=locked_until):
+                job.locked_until = locked_until
+                return job
+        return None
+
+class FetchJob(models.Model):
+    """
+    A request to fetch a package's releases in the background, kept until a
+    worker has run it successfully.
+    """
+    pypackage = models.OneToOneField(PyPackage, related_name='fetch_job')
+    update_package = models.BooleanField(default=False)
+    created = models.DateTimeField(auto_now_add=True)
+    # None once the job has failed JOB_MAX_ATTEMPTS times
+    run_after = models.DateTimeField(default=datetime.now, null=True,
+            db_index=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    objects = FetchJobManager()
+
+    def __unicode__(self):
+        return u"fetch %s" % self.pypackage
+
+    def run(self):
+        """
+        Fetch the releases, retrying later with exponential backoff on
+        failure, including the failure of any single version. Returns
+        whether the fetch succeeded.
+        """
+        try:
+            failed = self.pypackage.fetch_releases()
+            if self.update_package:
+                self.pypackage.update_packaginator_package()
+        except Exception:
+            self._retry_later(traceback.format_exc())
+            return False
+        if failed:
+            # the other versions are stored, the next run fetches the rest
+            self._retry_later("\n".join("%s: %s" % (version, error)
+                    for version, error in sorted(failed.items())))
+            return False
+        # a job enqueued again while running has a new run_after, keep it
+        FetchJob.objects.filter(pk=self.pk, run_after=self.run_after).delete()
+        FetchJob.objects.filter(pk=self.pk).update(locked_until=None)
+        return True
+
+    def _retry_later(self, error):
+        attempts = self.attempts + 1
+        if attempts >= conf.JOB_MAX_ATTEMPTS:
+            run_after = None
+        else:
+            run_after = datetime.now() + timedelta(
+                    seconds=conf.JOB_RETRY_DELAY * 2 ** (attempts - 1))
+        FetchJob.objects.filter(pk=self.pk).update(attempts=attempts,
+                run_after=run_after, locked_until=None, last_error=error)
@@ -0,0 +1,159 @@
+"""
+Request rate limits shared by everything talking to an index.
+
+Each index url gets a token bucket that every call to it waits on. The
+bucket's rate halves whenever a call fails or is slow, down to a sixteenth
+of the configured rate, and creeps back up while calls succeed. Calls made
+for someone waiting on a web request, marked with ``interactive()``, are let
+through ahead of background ones.
+
+Buckets live in the process making the calls, so each process gets the
+configured allowance to itself.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from pypackage import conf, instrumentation
+
+_local = threading.local()
+
+
+@contextmanager
+def interactive():
+    """
+    Mark the index calls made by the current thread inside the block as
+    interactive.
+    """
+    previous = is_interactive()
+    _local.interactive = True
+    try:
+        yield
+    finally:
+        _local.interactive = previous
+
+
+def is_interactive():
+    return getattr(_local, 'interactive', False)
+
+
+def inherit(func):
+    """
+    Wrap ``func`` to run with the calling thread's priority, for handing
+    work to other threads.
+    """
+    priority = is_interactive()
+    def run(*args, **kwargs):
+        _local.interactive = priority
+        return func(*args, **kwargs)
+    return run
+
+
+class TokenBucket(object):
+    """
+    Lets calls through at up to ``rate`` a second, after an initial burst of
+    up to ``burst``, adapting the rate to how the index copes.
+    """
+    def __init__(self, rate, burst, slow=None):
+        self.max_rate = float(rate)
+        self.min_rate = self.max_rate / 16
+        self.rate = self.max_rate
+        self.burst = max(1, burst)
+        self.slow = slow if slow is not None else conf.RATE_LIMIT_SLOW
+        self.tokens = float(self.burst)
+        self.updated = time.time()
+        self.interactive_waiting = 0
+        self.condition = threading.Condition()
+
+    def _refill(self):
+        now = time.time()
+        self.tokens = min(self.burst,
+                self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, interactive=False):
+        """
+        Wait for a token, letting interactive callers take them first.
+        Returns the seconds spent waiting.
+        """
+        started = time.time()
+        with self.condition:
+            if interactive:
+                self.interactive_waiting += 1
+            try:
+                while True:
+                    self._refill()
+                    if self.tokens >= 1 and (interactive or
+                            not self.interactive_waiting):
+                        self.tokens -= 1
+                        return time.time() - started
+                    if self.tokens >= 1:
+                        # leave this one to an interactive caller
+                        self.condition.wait(0.01)
+                    else:
+                        self.condition.wait((1 - self.tokens) / self.rate)
+            finally:
+                if interactive:
+                    self.interactive_waiting -= 1
+                    self.condition.notify_all()
+
+    def report(self, seconds, failed=False):
+        """
+        Adapt the rate to a call that took ``seconds`` and ``failed`` or not.
+        """
+        with self.condition:
+            self._refill()
+            if failed or seconds > self.slow:
+                self.rate = max(self.min_rate, self.rate / 2)
+            else:
+                self.rate = min(self.max_rate, self.rate + self.min_rate)
+
+    @contextmanager
+    def limit(self):
+        """
+        Wait for a token, then time the block and adapt to how it went.
+        """
+        waited = self.acquire(is_interactive())
+        instrumentation.timing('ratelimit.wait', waited)
+        started = time.time()
+        try:
+            yield
+        except Exception:
+            self.report(time.time() - started, failed=True)
+            raise
+        self.report(time.time() - started)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(index_api_url):
+    """
+    Return the bucket shared by calls to ``index_api_url``, as configured by
+    ``PYPACKAGE_RATE_LIMITS``, or None if calls to it aren't limited.
+    """
+    with _buckets_lock:
+        if index_api_url not in _buckets:
+            limit = conf.RATE_LIMITS.get(index_api_url,
+                    conf.DEFAULT_RATE_LIMIT)
+            bucket = None
+            # None or an empty dict both mean no limit
+            if limit:
+                bucket = TokenBucket(limit['rate'],
+                        limit.get('burst', limit['rate']))
+            _buckets[index_api_url] = bucket
+        return _buckets[index_api_url]
+
+
+@contextmanager
+def limit(index_api_url):
+    """
+    Hold up the block until ``index_api_url``'s rate limit lets it through.
+    """
+    bucket = get_bucket(index_api_url)
+    if bucket is None:
+        yield
+        return
+    with bucket.limit():
+        yield
@@ -0,0 +1,48 @@
+"""
+Working out a release's source repository from its home page.
+
+Resolutions are memoized per home page, as many releases, and packages,
+share one.
+"""
+import re
+import threading
+
+from package import repos
+from pypackage import conf
+
+github_re = re.compile(r'((?:http|https|git)://github\.com/[^/]*/[^/]*)/?')
+
+_resolved = {}
+_lock = threading.Lock()
+
+
+def resolve(home_page):
+    """
+    Return the repository url for ``home_page``, or an empty string when it
+    isn't hosted anywhere we support.
+    """
+    home_page = home_page or ''
+    try:
+        return _resolved[home_page]
+    except KeyError:
+        pass
+    repo_url = _resolve(home_page)
+    with _lock:
+        if len(_resolved) >= conf.REPO_URL_CACHE_SIZE:
+            _resolved.clear()
+        _resolved[home_page] = repo_url
+    return repo_url
+
+
+def _resolve(home_page):
+    # github is by far the most common, so skip the handler lookup for it
+    match = github_re.match(home_page)
+    if match:
+        return match.group(1)
+    handler = repos.get_repo_for_repo_url(home_page)
+    if isinstance(handler, (repos.unsupported.UnsupportedHandler,
+            repos.github.GitHubHandler)):
+        # github urls not pointing at a repository aren't any use either
+        return ''
+    # only github is special cased for now
+    return home_page
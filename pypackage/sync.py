@@ -0,0 +1,105 @@
+"""
+Incremental updates driven by an index's changelog.
+
+Rather than re-listing every release of every package, ``sync_index`` asks
+the index what changed since the last serial we processed and refreshes only
+the affected releases of the packages we track.
+"""
+import logging
+
+from pypackage import client
+from pypackage.models import IndexName, IndexSync, PyPackage
+
+logger = logging.getLogger(__name__)
+
+
+def changed_releases(changes):
+    """
+    Group changelog entries by lower cased package name.
+
+    Returns a dict mapping each name to ``(updated, removed, first_serial)``
+    where ``updated`` and ``removed`` are sets of versions and
+    ``first_serial`` is the serial of the package's earliest change.
+    """
+    changed = {}
+    for name, version, timestamp, action, serial in changes:
+        updated, removed, first_serial = changed.setdefault(name.lower(),
+                (set(), set(), serial))
+        if serial < first_serial:
+            changed[name.lower()] = (updated, removed, serial)
+        if not version:
+            # package level changes (roles, docs) don't touch releases
+            continue
+        if action == 'remove':
+            removed.add(version)
+            updated.discard(version)
+        else:
+            updated.add(version)
+            removed.discard(version)
+    return changed
+
+
+def changed_names(changes):
+    """
+    Return the sets of package names seen in and removed by changelog
+    entries, in the spelling the index uses.
+    """
+    added = set()
+    removed = set()
+    for name, version, timestamp, action, serial in changes:
+        if action == 'remove' and not version:
+            removed.add(name)
+            added.discard(name)
+        elif action != 'remove':
+            added.add(name)
+            removed.discard(name)
+    return added, removed
+
+
+def sync_index(index_api_url, timeout=None):
+    """
+    Bring the packages we track on ``index_api_url`` up to date with the
+    index's changelog since the previous sync.
+
+    The first sync of an index only records where the changelog is up to,
+    releases being created by ``PyPackage.fetch_releases`` until then.
+    Returns the list of packages that were updated.
+    """
+    state, created = IndexSync.objects.get_or_create(
+            index_api_url=index_api_url)
+    with client.connect(index_api_url, timeout) as proxy:
+        if state.last_serial is None:
+            state.last_serial = proxy.changelog_last_serial()
+            state.save()
+            return []
+        changes = proxy.changelog_since_serial(state.last_serial)
+    if not changes:
+        return []
+
+    last_serial = max(change[4] for change in changes)
+    added, removed = changed_names(changes)
+    IndexName.objects.update_names(index_api_url, added, removed)
+    changed = changed_releases(changes)
+    tracked = PyPackage.objects.filter(index_api_url=index_api_url)
+    updated_packages = []
+    for pypackage in tracked:
+        if pypackage.name.lower() not in changed:
+            continue
+        updated, removed, first_serial = changed[pypackage.name.lower()]
+        try:
+            if removed:
+                pypackage.releases.filter(version__in=removed).delete()
+            failed = pypackage.update_releases(updated, timeout=timeout)
+        except Exception as e:
+            logger.exception("Could not sync %s from %s" %
+                    (pypackage.name, index_api_url))
+            failed = e
+        if failed:
+            # pick these changes up again on the next sync
+            last_serial = min(last_serial, first_serial - 1)
+        else:
+            updated_packages.append(pypackage)
+
+    state.last_serial = last_serial
+    state.save()
+    return updated_packages
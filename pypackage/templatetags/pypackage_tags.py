@@ -0,0 +1,52 @@
+from django import template
+
+from pypackage.models import PyPackage
+
+register = template.Library()
+
+class PrefetchPyPINode(template.Node):
+
+    def __init__(self, objects, attribute=None, releases=True):
+        self.objects = template.Variable(objects)
+        self.attribute = attribute
+        self.releases = releases
+
+    def render(self, context):
+        try:
+            objects = self.objects.resolve(context)
+        except template.VariableDoesNotExist:
+            return ''
+        if self.attribute:
+            packages = [getattr(o, self.attribute) for o in objects]
+        else:
+            packages = objects
+        PyPackage.objects.attach_to(packages, releases=self.releases)
+        return ''
+
+@register.tag
+def prefetch_pypi(parser, token):
+    """
+    Loads the PyPI data of a list of packages, or of objects pointing at
+    packages, in one query::
+
+        {% prefetch_pypi packages %}
+        {% prefetch_pypi grid_packages via package %}
+
+    The list must be the same object the template goes on to loop over.
+
+    Ending with ``lazy`` leaves the latest releases to be loaded when used,
+    for templates caching what they show of them::
+
+        {% prefetch_pypi packages lazy %}
+    """
+    bits = token.split_contents()
+    releases = bits[-1] != 'lazy'
+    if not releases:
+        bits.pop()
+    if len(bits) == 2:
+        return PrefetchPyPINode(bits[1], releases=releases)
+    if len(bits) == 4 and bits[2] == 'via':
+        return PrefetchPyPINode(bits[1], bits[3], releases=releases)
+    raise template.TemplateSyntaxError(
+            "%r takes 'packages' or 'objects via attribute', optionally "
+            "followed by 'lazy'" % bits[0])
@@ -1,2 +1,13 @@
 # from pypi.tests.test_slurper import *
 from pypackage.tests.test_form import PyPackageFormTests
+from pypackage.tests.test_client import (FetchReleaseDataTests,
+        TransportPoolTests, IndexCacheTests, InstrumentationTests)
+from pypackage.tests.test_models import (FetchReleasesTests,
+        FailureIsolationTests, RefreshDownloadsTests, ReleaseHistoryTests,
+        AttachToTests, IndexNameTests, FetchJobTests, RefreshCommandTests)
+from pypackage.tests.test_sync import ChangedReleasesTests
+from pypackage.tests.test_utils import RunInPoolTests, VersionSortKeyTests
+from pypackage.tests.test_jsonapi import JSONBackendTests
+from pypackage.tests.test_dump import ImportDumpTests
+from pypackage.tests.test_ratelimit import (TokenBucketTests,
+        RateLimitedIndexTests)
@@ -0,0 +1,176 @@
+import threading
+import xmlrpclib
+from SimpleXMLRPCServer import SimpleXMLRPCServer, SimpleXMLRPCRequestHandler
+
+from django.test import TestCase
+
+from pypackage import client, instrumentation
+from pypackage.benchmarks.fakeindex import FakeIndex
+from pypackage.cache import IndexCache, MemoryBackend, index_cache
+
+TEST_PACKAGE_NAME = 'fake-package'
+TEST_PACKAGE_VERSIONS = ['0.1', '0.2', '1.0']
+
+def release_data(name, version):
+    return {
+        'name': name,
+        'version': version,
+        '_pypi_hidden': False,
+        'license': 'UNKNOWN',
+        'classifiers': ['License :: OSI Approved :: BSD License'],
+        'summary': 'A package served by a fake index',
+        'description': 'A long description. ' * 100,
+        'home_page': 'http://github.com/fake/fake-package/',
+        }
+
+class QuietRequestHandler(SimpleXMLRPCRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+class KeepAliveRequestHandler(QuietRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+def release_urls(name, version):
+    return [{'downloads': 10}, {'downloads': 5}]
+
+def start_index(multicall=True, keep_alive=False, urls=release_urls):
+    if keep_alive:
+        handler = KeepAliveRequestHandler
+    else:
+        handler = QuietRequestHandler
+    server = SimpleXMLRPCServer(('127.0.0.1', 0), handler,
+            allow_none=True, logRequests=False)
+    server.register_function(
+            lambda name, show_hidden=False: TEST_PACKAGE_VERSIONS,
+            'package_releases')
+    server.register_function(release_data, 'release_data')
+    server.register_function(urls, 'release_urls')
+    if multicall:
+        server.register_multicall_functions()
+    thread = threading.Thread(target=server.serve_forever)
+    thread.setDaemon(True)
+    thread.start()
+    return server, 'http://127.0.0.1:%s/' % server.server_address[1]
+
+class FetchReleaseDataTests(TestCase):
+
+    def setUp(self):
+        index_cache.clear()
+
+    def check_fetched(self, url, **kwargs):
+        fetched, failed = client.fetch_release_data(url, TEST_PACKAGE_NAME,
+                TEST_PACKAGE_VERSIONS, **kwargs)
+        self.assertEquals(failed, {})
+        self.assertEquals(sorted(fetched.keys()), TEST_PACKAGE_VERSIONS)
+        data, urls = fetched['0.2']
+        self.assertEquals(data['version'], '0.2')
+        self.assertEquals(sum(u['downloads'] for u in urls), 15)
+
+    def test_multicall(self):
+        server, url = start_index()
+        try:
+            self.check_fetched(url, workers=1)
+            self.assertFalse(url in client._no_multicall)
+        finally:
+            server.shutdown()
+
+    def test_faults_are_not_retried(self):
+        index = FakeIndex({TEST_PACKAGE_NAME: 1}, fault_rate=1).start()
+        try:
+            fetched, failed = client.fetch_release_data(index.url,
+                    TEST_PACKAGE_NAME, ['0.0'])
+            self.assertTrue(isinstance(failed['0.0'], xmlrpclib.Fault))
+            self.assertEquals(index.calls['release_data'], 1)
+        finally:
+            index.stop()
+
+    def test_fallback_without_multicall(self):
+        server, url = start_index(multicall=False)
+        try:
+            self.check_fetched(url, workers=2)
+            self.assertTrue(url in client._no_multicall)
+        finally:
+            server.shutdown()
+
+class TransportPoolTests(TestCase):
+
+    def test_connections_are_reused(self):
+        server, url = start_index(keep_alive=True)
+        before = client.pool.stats()
+        try:
+            for i in range(3):
+                with client.connect(url) as proxy:
+                    proxy.release_urls(TEST_PACKAGE_NAME, '1.0')
+            after = client.pool.stats()
+            self.assertEquals(after['new'] - before['new'], 1)
+            self.assertEquals(after['reused'] - before['reused'], 2)
+        finally:
+            # let the server's handler see the connection close
+            client.pool.clear()
+            server.shutdown()
+
+class IndexCacheTests(TestCase):
+
+    def test_least_recently_used_are_evicted(self):
+        backend = MemoryBackend(max_entries=2)
+        backend.set('a', 1, 60)
+        backend.set('b', 2, 60)
+        backend.get('a')
+        backend.set('c', 3, 60)
+        self.assertEquals(backend.get('a'), 1)
+        self.assertEquals(backend.get('b'), None)
+        self.assertEquals(backend.get('c'), 3)
+
+    def test_expired_entries_are_misses(self):
+        backend = MemoryBackend()
+        backend.set('a', 1, -1)
+        self.assertEquals(backend.get('a'), None)
+
+    def test_per_method_ttls_and_stats(self):
+        cache = IndexCache(MemoryBackend(), {'release_data': 60})
+        url = 'http://example.com/pypi'
+        cache.set(url, 'release_data', ('foo', '1.0'), {'version': '1.0'})
+        cache.set(url, 'release_urls', ('foo', '1.0'), [])
+        self.assertEquals(cache.get(url, 'release_data', 'foo', '1.0'),
+                {'version': '1.0'})
+        self.assertEquals(cache.get(url, 'release_data', 'foo', '2.0'), None)
+        self.assertEquals(cache.get(url, 'release_urls', 'foo', '1.0'), None)
+        self.assertEquals(cache.stats(), {'hits': {'release_data': 1},
+                'misses': {'release_data': 1}})
+
+    def test_fetch_release_data_uses_cache(self):
+        index_cache.clear()
+        server, url = start_index()
+        try:
+            client.fetch_release_data(url, TEST_PACKAGE_NAME,
+                    TEST_PACKAGE_VERSIONS)
+        finally:
+            server.shutdown()
+        # the index is gone, so these can only come from the cache
+        fetched, failed = client.fetch_release_data(url, TEST_PACKAGE_NAME,
+                TEST_PACKAGE_VERSIONS)
+        self.assertEquals(sorted(fetched.keys()), TEST_PACKAGE_VERSIONS)
+
+class InstrumentationTests(TestCase):
+
+    def setUp(self):
+        index_cache.clear()
+        self.sink = instrumentation.MemorySink()
+        instrumentation.sinks.append(self.sink)
+
+    def tearDown(self):
+        instrumentation.sinks.remove(self.sink)
+
+    def test_index_calls_are_recorded(self):
+        server, url = start_index(multicall=False)
+        try:
+            client.fetch_release_data(url, TEST_PACKAGE_NAME, ['0.1'])
+        finally:
+            server.shutdown()
+        counters = self.sink.counters
+        self.assertEquals(counters['index.release_data.calls'], 1)
+        self.assertEquals(counters['index.release_urls.calls'], 1)
+        self.assertTrue(counters['index.bytes_received'] > 0)
+        self.assertEquals(sum(count for bound, count in
+            self.sink.histogram('index.release_data')), 1)
@@ -0,0 +1,62 @@
+import json
+import os
+import sqlite3
+import tempfile
+
+from django.test import TestCase
+
+from pypackage.dump import import_dump, read_jsonl, read_sqlite
+from pypackage.models import PyPackage
+from pypackage.tests.test_client import (release_data, TEST_PACKAGE_NAME,
+        TEST_PACKAGE_VERSIONS)
+
+URLS = [{'downloads': 10}, {'downloads': 5}]
+
+class ImportDumpTests(TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def write_jsonl(self):
+        with open(self.path, 'w') as f:
+            f.write(json.dumps({'name': TEST_PACKAGE_NAME, 'releases': dict(
+                    (v, {'data': release_data(TEST_PACKAGE_NAME, v),
+                    'urls': URLS}) for v in TEST_PACKAGE_VERSIONS)}) + '\n')
+
+    def check_imported(self):
+        pypackage = PyPackage.objects.get(name=TEST_PACKAGE_NAME)
+        self.assertEquals(pypackage.packaginator_package.slug,
+                TEST_PACKAGE_NAME)
+        self.assertEquals(sorted(pypackage.releases.values_list('version',
+                flat=True)), TEST_PACKAGE_VERSIONS)
+        self.assertEquals(pypackage.downloads, 15 * len(TEST_PACKAGE_VERSIONS))
+
+    def test_import_jsonl(self):
+        self.write_jsonl()
+        self.assertEquals(import_dump(read_jsonl(self.path), 'http://x/'),
+                (1, len(TEST_PACKAGE_VERSIONS)))
+        self.check_imported()
+
+    def test_import_sqlite(self):
+        db = sqlite3.connect(self.path)
+        db.execute("CREATE TABLE releases (name, version, release_data, "
+                "release_urls)")
+        for version in TEST_PACKAGE_VERSIONS:
+            db.execute("INSERT INTO releases VALUES (?, ?, ?, ?)",
+                    (TEST_PACKAGE_NAME, version, json.dumps(release_data(
+                    TEST_PACKAGE_NAME, version)), json.dumps(URLS)))
+        db.commit()
+        db.close()
+        import_dump(read_sqlite(self.path), 'http://x/')
+        self.check_imported()
+
+    def test_known_releases_are_skipped(self):
+        self.write_jsonl()
+        import_dump(read_jsonl(self.path), 'http://x/')
+        self.assertEquals(import_dump(read_jsonl(self.path), 'http://x/'),
+                (1, 0))
+        self.check_imported()
@@ -39,5 +39,16 @@ class PyPackageFormTests(TestCase):
         self.assertFalse(form.is_valid())
         self.assertTrue('pypi_slug' in form.errors)
 
+    def test_fail_on_dupe_pypi_in_other_case(self):
+        category = Category.objects.all()[0].id
+        data = {'title':'Django',
+                'slug':'Django',
+                'repo_url':'',
+                'pypi_slug':'DJANGO',
+                'category':category}
+        form = PyPackageForm(data)
+        self.assertFalse(form.is_valid())
+        self.assertTrue('pypi_slug' in form.errors)
+
 
 
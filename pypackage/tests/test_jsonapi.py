@@ -0,0 +1,86 @@
+import json
+import threading
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from StringIO import StringIO
+
+from django.test import TestCase
+
+from pypackage.cache import index_cache
+from pypackage.jsonapi import JSONBackend, read_document, release_data as \
+        shape_release_data
+from pypackage.tests.test_client import (release_data, TEST_PACKAGE_NAME,
+        TEST_PACKAGE_VERSIONS)
+
+def package_document(version=None):
+    return {
+        'info': release_data(TEST_PACKAGE_NAME,
+            version or TEST_PACKAGE_VERSIONS[-1]),
+        'releases': dict((v, [{'downloads': 10}, {'downloads': -1}])
+            for v in TEST_PACKAGE_VERSIONS),
+        'urls': [],
+        }
+
+class JSONIndexHandler(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(self.path)
+        parts = self.path.strip('/').split('/')
+        if parts[0] != TEST_PACKAGE_NAME or parts[-1] != 'json':
+            self.send_error(404)
+            return
+        version = len(parts) == 3 and parts[1] or None
+        body = json.dumps(package_document(version))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class JSONBackendTests(TestCase):
+
+    def setUp(self):
+        index_cache.clear()
+        JSONIndexHandler.requests = []
+        self.server = HTTPServer(('127.0.0.1', 0), JSONIndexHandler)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.setDaemon(True)
+        thread.start()
+        self.backend = JSONBackend('http://127.0.0.1:%s/' %
+                self.server.server_address[1])
+
+    def tearDown(self):
+        self.server.shutdown()
+
+    def test_read_document(self):
+        info, releases = read_document(StringIO(json.dumps(package_document())))
+        self.assertEquals(info['version'], TEST_PACKAGE_VERSIONS[-1])
+        self.assertEquals(sorted(releases.keys()), TEST_PACKAGE_VERSIONS)
+
+    def test_null_license(self):
+        info = release_data(TEST_PACKAGE_NAME, '1.0')
+        info['license'] = None
+        data = shape_release_data(info)
+        self.assertEquals(data['license'], '')
+        self.assertEquals(data['classifiers'],
+                ['License :: OSI Approved :: BSD License'])
+
+    def test_package_releases(self):
+        self.assertEquals(sorted(self.backend.package_releases(
+            TEST_PACKAGE_NAME)), TEST_PACKAGE_VERSIONS)
+        self.assertEquals(self.backend.package_releases('missing'), [])
+
+    def test_fetch_release_data(self):
+        fetched, failed = self.backend.fetch_release_data(TEST_PACKAGE_NAME,
+                TEST_PACKAGE_VERSIONS + ['9.9'])
+        self.assertEquals(sorted(fetched.keys()), TEST_PACKAGE_VERSIONS)
+        self.assertEquals(failed.keys(), ['9.9'])
+        data, urls = fetched['0.1']
+        self.assertEquals(data['version'], '0.1')
+        self.assertEquals(sum(u['downloads'] for u in urls), 10)
+        # one package document, plus a document for each older release
+        self.assertEquals(len(JSONIndexHandler.requests),
+                len(TEST_PACKAGE_VERSIONS))
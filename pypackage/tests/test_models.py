@@ -0,0 +1,359 @@
+import os
+import tempfile
+from datetime import date, timedelta
+from StringIO import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+
+from package.models import Package, Version
+from pypackage.benchmarks.fakeindex import FakeIndex
+from pypackage.cache import index_cache
+from pypackage.models import (Classifier, DailyDownloads, FetchJob,
+        IndexName, PyPackage, PyRelease, ReleaseDescription, ReleaseFailure,
+        clean_release_data)
+from pypackage.tests.test_client import (start_index, release_data,
+        release_urls, TEST_PACKAGE_NAME, TEST_PACKAGE_VERSIONS)
+
+class PyPackageTestCase(TestCase):
+
+    def setUp(self):
+        index_cache.clear()
+        self.server, url = start_index()
+        package = Package.objects.create(title=TEST_PACKAGE_NAME,
+                slug=TEST_PACKAGE_NAME)
+        self.pypackage = PyPackage.objects.create(packaginator_package=package,
+                name=TEST_PACKAGE_NAME, index_api_url=url)
+
+    def tearDown(self):
+        self.server.shutdown()
+
+class FetchReleasesTests(PyPackageTestCase):
+
+    def test_fetch_releases(self):
+        self.pypackage.fetch_releases()
+        versions = self.pypackage.releases.values_list('version', flat=True)
+        self.assertEquals(sorted(versions), TEST_PACKAGE_VERSIONS)
+        release = self.pypackage.releases.get(version='0.2')
+        self.assertEquals(release.downloads, 15)
+        self.assertEquals(release.license, ' BSD License')
+        self.assertEquals(release.packaginator_version.number, '0.2')
+        self.assertEquals(release.packaginator_version.license, ' BSD License')
+        self.assertEquals(release.description,
+                release_data(TEST_PACKAGE_NAME, '0.2')['description'])
+        # every version shares the same description
+        self.assertEquals(ReleaseDescription.objects.count(), 1)
+        self.assertEquals(release.classifiers,
+                ['License :: OSI Approved :: BSD License'])
+        self.assertEquals(release.repo_url,
+                'http://github.com/fake/fake-package')
+
+    def test_classifier_queries(self):
+        self.pypackage.fetch_releases()
+        bsd = 'License :: OSI Approved :: BSD License'
+        self.assertEquals(list(PyPackage.objects.with_classifier(bsd)),
+                [self.pypackage])
+        facets = [(c.name, c.packages)
+                for c in Classifier.objects.license_facets()]
+        self.assertEquals(facets, [(bsd, 1)])
+
+    def test_fetch_releases_updates_totals(self):
+        self.pypackage.fetch_releases()
+        pypackage = PyPackage.objects.get(pk=self.pypackage.pk)
+        self.assertEquals(pypackage.downloads, 15 * len(TEST_PACKAGE_VERSIONS))
+        self.assertEquals(pypackage.latest.version, '1.0')
+
+    def test_data_version_bumped_by_changes(self):
+        self.pypackage.fetch_releases()
+        version = PyPackage.objects.get(pk=self.pypackage.pk).data_version
+        self.assertEquals(version, self.pypackage.data_version)
+        # nothing new on the index, nothing to invalidate
+        self.pypackage.fetch_releases()
+        self.assertEquals(
+                PyPackage.objects.get(pk=self.pypackage.pk).data_version,
+                version)
+        self.pypackage.update_releases(['1.0'])
+        self.assertEquals(
+                PyPackage.objects.get(pk=self.pypackage.pk).data_version,
+                version + 1)
+
+    def test_fetch_releases_skips_known_versions(self):
+        self.pypackage.fetch_releases()
+        self.pypackage.fetch_releases()
+        self.assertEquals(self.pypackage.releases.count(),
+                len(TEST_PACKAGE_VERSIONS))
+
+    def test_store_releases_in_constant_queries(self):
+        Version.objects.create(package=self.pypackage.packaginator_package,
+                number='0.1')
+        fetched = dict((v, (release_data(TEST_PACKAGE_NAME, v), []))
+                for v in ['0.1', '0.2', '0.3', '0.4', '0.5'])
+        # load versions, relicense 0.1, insert versions, reload versions,
+        # load, insert and reload descriptions, insert releases, load release
+        # keys, load, insert and reload classifiers, link classifiers, insert
+        # download snapshots, then sum downloads, find latest, update and
+        # insert today's total, look for a total before the growth window,
+        # fall back to the first total and store it all
+        self.assertNumQueries(21, self.pypackage.store_releases, fetched)
+        self.assertEquals(self.pypackage.releases.count(), 5)
+
+class FailureIsolationTests(TestCase):
+
+    def setUp(self):
+        index_cache.clear()
+        def urls(name, version):
+            if version == '0.2':
+                return [{'downloads': 'lots'}]
+            return [{'downloads': 10}]
+        self.server, url = start_index(urls=urls)
+        package = Package.objects.create(title=TEST_PACKAGE_NAME,
+                slug=TEST_PACKAGE_NAME)
+        self.pypackage = PyPackage.objects.create(packaginator_package=package,
+                name=TEST_PACKAGE_NAME, index_api_url=url)
+
+    def tearDown(self):
+        self.server.shutdown()
+
+    def test_bad_versions_are_recorded_and_retried(self):
+        failed = self.pypackage.fetch_releases()
+        self.assertEquals(failed.keys(), ['0.2'])
+        self.assertEquals(sorted(self.pypackage.releases.values_list(
+                'version', flat=True)), ['0.1', '1.0'])
+        self.pypackage.fetch_releases()
+        failure = ReleaseFailure.objects.get(pypackage=self.pypackage)
+        self.assertEquals((failure.version, failure.attempts), ('0.2', 2))
+
+    def test_license_from_classifiers(self):
+        data, urls = clean_release_data({'license': None, 'classifiers':
+                ['License :: OSI Approved :: BSD License']}, [])
+        release = self.pypackage.release_from_data('1.0', data, urls)
+        self.assertEquals(release.license, ' BSD License')
+
+    def test_clean_release_data(self):
+        data, urls = clean_release_data({'platform': 'x' * 200,
+                'summary': None, 'classifiers': ['Framework :: Django ', 3]},
+                [{'downloads': -1}])
+        max_length = PyRelease._meta.get_field('platform').max_length
+        self.assertEquals(len(data['platform']), max_length)
+        self.assertEquals(data['summary'], u'')
+        self.assertEquals(data['classifiers'], ['Framework :: Django'])
+        self.assertEquals(data['license'], u'')
+        self.assertEquals(urls, [{'downloads': 0}])
+
+class RefreshDownloadsTests(PyPackageTestCase):
+
+    def test_only_changed_counts_are_written(self):
+        self.pypackage.fetch_releases()
+        self.pypackage.releases.filter(version='0.2').update(downloads=1)
+        changed, failed = self.pypackage.refresh_downloads()
+        self.assertEquals((changed, failed), (1, {}))
+        self.assertEquals(
+                self.pypackage.releases.get(version='0.2').downloads, 15)
+        pypackage = PyPackage.objects.get(pk=self.pypackage.pk)
+        self.assertEquals(pypackage.downloads, 15 * len(TEST_PACKAGE_VERSIONS))
+
+    def test_download_history(self):
+        self.pypackage.fetch_releases()
+        self.pypackage.releases.filter(version='0.2').update(downloads=1)
+        self.pypackage.update_totals()
+        self.pypackage.refresh_downloads()
+        release = self.pypackage.releases.get(version='0.2')
+        # the day's snapshot is replaced rather than added to
+        self.assertEquals(list(release.download_snapshots.values_list(
+                'downloads', flat=True)), [15])
+        today = date.today()
+        self.assertEquals([d.downloads for d in DailyDownloads.objects.between(
+                self.pypackage, today, today)], [15 * len(TEST_PACKAGE_VERSIONS)])
+
+    def test_growth_over_recent_days(self):
+        self.pypackage.fetch_releases()
+        total = 15 * len(TEST_PACKAGE_VERSIONS)
+        DailyDownloads.objects.create(pypackage=self.pypackage,
+                day=date.today() - timedelta(days=3), downloads=total - 20)
+        DailyDownloads.objects.create(pypackage=self.pypackage,
+                day=date.today() - timedelta(days=100), downloads=0)
+        self.pypackage.update_totals()
+        pypackage = PyPackage.objects.get(pk=self.pypackage.pk)
+        # counted from the total standing when the window opened
+        self.assertEquals(pypackage.downloads_growth, total)
+        DailyDownloads.objects.filter(day__lt=date.today() - timedelta(
+                days=50)).delete()
+        # refreshes move the growth on even when nothing changed
+        self.pypackage.refresh_downloads()
+        pypackage = PyPackage.objects.get(pk=self.pypackage.pk)
+        self.assertEquals(pypackage.downloads_growth, 20)
+
+    def test_nothing_written_when_unchanged(self):
+        self.pypackage.fetch_releases()
+        # list the stored releases, then look for a total before the growth
+        # window and fall back to the first, writing nothing
+        self.assertNumQueries(3, self.pypackage.refresh_downloads)
+
+class ReleaseHistoryTests(PyPackageTestCase):
+
+    def test_pages_newest_first(self):
+        self.pypackage.fetch_releases()
+        pages = []
+        cursor = None
+        while True:
+            history = self.pypackage.release_history(cursor, limit=2)
+            pages.append([r['version'] for r in history['releases']])
+            cursor = history['next']
+            if cursor is None:
+                break
+        self.assertEquals(pages, [['1.0', '0.2'], ['0.1']])
+
+    def test_hidden_releases_left_out(self):
+        self.pypackage.fetch_releases()
+        self.pypackage.releases.filter(version='1.0').update(hidden=True)
+        history = self.pypackage.release_history()
+        self.assertEquals([r['version'] for r in history['releases']],
+                ['0.2', '0.1'])
+        self.assertEquals(len(self.pypackage.release_history(
+                include_hidden=True)['releases']), 3)
+
+    def test_one_query_per_page(self):
+        self.pypackage.fetch_releases()
+        self.assertNumQueries(1, self.pypackage.release_history, limit=1)
+
+    def test_malformed_cursor(self):
+        self.assertRaises(ValueError, self.pypackage.release_history, 'junk')
+
+class AttachToTests(PyPackageTestCase):
+
+    def test_attach_to(self):
+        self.pypackage.fetch_releases()
+        Package.objects.create(title='not-on-pypi', slug='not-on-pypi')
+        packages = list(Package.objects.order_by('title'))
+        self.assertNumQueries(1, PyPackage.objects.attach_to, packages)
+        data = []
+        def read_pypi_data():
+            data.extend((p.pypi.latest.version, p.pypi.downloads)
+                    for p in packages if p.pypi)
+        self.assertNumQueries(0, read_pypi_data)
+        self.assertEquals(data, [('1.0', 45)])
+
+    def test_lazy_attach_to_leaves_releases_alone(self):
+        self.pypackage.fetch_releases()
+        packages = list(Package.objects.all())
+        PyPackage.objects.attach_to(packages, releases=False)
+        pypackage = packages[0].pypi
+        self.assertNumQueries(0, lambda: pypackage.downloads)
+        self.assertNumQueries(1, lambda: pypackage.latest)
+
+class IndexNameTests(TestCase):
+
+    def setUp(self):
+        index_cache.clear()
+        self.index = FakeIndex({'Fake-Package': 1}).start()
+
+    def tearDown(self):
+        self.index.stop()
+
+    def test_lookup_after_load(self):
+        self.assertEquals(IndexName.objects.load(self.index.url), 1)
+        self.assertEquals(IndexName.objects.lookup(self.index.url,
+                'fake-PACKAGE'), 'Fake-Package')
+        self.assertFalse('package_releases' in self.index.calls)
+
+    def test_lookup_falls_back_to_index(self):
+        self.assertEquals(IndexName.objects.lookup(self.index.url,
+                'Fake-Package'), 'Fake-Package')
+        self.assertEquals(IndexName.objects.lookup(self.index.url, 'other'),
+                None)
+        self.assertEquals(self.index.calls['package_releases'], 2)
+        # found on the index, so remembered
+        IndexName.objects.lookup(self.index.url, 'fake-package')
+        self.assertEquals(self.index.calls['package_releases'], 2)
+
+class FetchJobTests(PyPackageTestCase):
+
+    def test_enqueue_merges_pending_jobs(self):
+        FetchJob.objects.enqueue(self.pypackage)
+        FetchJob.objects.enqueue(self.pypackage, update_package=True)
+        self.assertEquals(FetchJob.objects.count(), 1)
+        self.assertTrue(FetchJob.objects.get().update_package)
+
+    def test_claim_and_run(self):
+        FetchJob.objects.enqueue(self.pypackage)
+        job = FetchJob.objects.claim()
+        self.assertEquals(job.pypackage, self.pypackage)
+        # a claimed job isn't handed to another worker
+        self.assertEquals(FetchJob.objects.claim(), None)
+        self.assertTrue(job.run())
+        self.assertEquals(FetchJob.objects.count(), 0)
+        self.assertEquals(self.pypackage.releases.count(),
+                len(TEST_PACKAGE_VERSIONS))
+
+    def test_failed_job_is_retried_later(self):
+        FetchJob.objects.enqueue(self.pypackage)
+        self.server.shutdown()
+        self.server.server_close()
+        index_cache.clear()
+        job = FetchJob.objects.claim()
+        self.assertFalse(job.run())
+        job = FetchJob.objects.get()
+        self.assertEquals(job.attempts, 1)
+        self.assertEquals(job.locked_until, None)
+        self.assertTrue(job.last_error)
+        self.assertEquals(FetchJob.objects.claim(), None)
+        self.server, url = start_index()
+
+    def test_failed_version_is_retried_later(self):
+        self.server.shutdown()
+        def urls(name, version):
+            if version == '0.2':
+                return [{'downloads': 'lots'}]
+            return [{'downloads': 10}]
+        self.server, url = start_index(urls=urls)
+        PyPackage.objects.filter(pk=self.pypackage.pk).update(
+                index_api_url=url)
+        FetchJob.objects.enqueue(self.pypackage)
+        job = FetchJob.objects.claim()
+        self.assertFalse(job.run())
+        job = FetchJob.objects.get()
+        self.assertEquals(job.attempts, 1)
+        self.assertEquals(job.locked_until, None)
+        self.assertTrue(job.last_error.startswith('0.2: '))
+        self.assertEquals(sorted(self.pypackage.releases.values_list(
+                'version', flat=True)), ['0.1', '1.0'])
+
+# the command's worker threads each open their own database connection
+class RefreshCommandTests(TransactionTestCase):
+
+    def setUp(self):
+        index_cache.clear()
+        def urls(name, version):
+            if name == 'broken-package' and version == '0.2':
+                return [{'downloads': 'lots'}]
+            return release_urls(name, version)
+        self.server, url = start_index(urls=urls)
+        self.pypackages = []
+        for name in (TEST_PACKAGE_NAME, 'broken-package'):
+            package = Package.objects.create(title=name, slug=name)
+            self.pypackages.append(PyPackage.objects.create(
+                    packaginator_package=package, name=name,
+                    index_api_url=url))
+        fd, self.checkpoint = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self):
+        self.server.shutdown()
+        if os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+
+    @skipUnlessDBFeature('test_db_allows_multiple_connections')
+    def test_refresh_in_parallel(self):
+        good, broken = self.pypackages
+        output = StringIO()
+        call_command('refresh_pypackages', workers=2,
+                checkpoint=self.checkpoint, stdout=output)
+        self.assertEquals(sorted(good.releases.values_list('version',
+                flat=True)), TEST_PACKAGE_VERSIONS)
+        self.assertEquals(sorted(broken.releases.values_list('version',
+                flat=True)), ['0.1', '1.0'])
+        self.assertTrue("Refreshed 1 of 2 packages" in output.getvalue())
+        self.assertTrue("1 failures:\n  broken-package: 1 versions failed"
+                in output.getvalue())
+        # only the package refreshed in full is skipped on resume
+        self.assertEquals(open(self.checkpoint).read(), "%d\n" % good.pk)
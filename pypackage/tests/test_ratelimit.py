@@ -0,0 +1,77 @@
+import threading
+import time
+import xmlrpclib
+
+from django.test import TestCase
+
+from pypackage import client, conf, ratelimit
+from pypackage.benchmarks.fakeindex import FakeIndex
+from pypackage.cache import index_cache
+from pypackage.ratelimit import TokenBucket
+
+class TokenBucketTests(TestCase):
+
+    def test_rate_is_limited_after_burst(self):
+        bucket = TokenBucket(rate=20, burst=2)
+        started = time.time()
+        for i in range(6):
+            bucket.acquire()
+        # two from the burst, then four at 20 a second
+        self.assertTrue(time.time() - started >= 0.19)
+
+    def test_backs_off_and_recovers(self):
+        bucket = TokenBucket(rate=16, burst=1, slow=1)
+        bucket.report(0.1, failed=True)
+        self.assertEquals(bucket.rate, 8)
+        bucket.report(2)
+        self.assertEquals(bucket.rate, 4)
+        for i in range(20):
+            bucket.report(0.1)
+        self.assertEquals(bucket.rate, 16)
+
+    def test_interactive_calls_go_first(self):
+        bucket = TokenBucket(rate=5, burst=1)
+        bucket.acquire()
+        order = []
+        def acquire(interactive):
+            bucket.acquire(interactive)
+            order.append(interactive)
+        batch = threading.Thread(target=acquire, args=(False,))
+        batch.start()
+        time.sleep(0.05)
+        acquire(True)
+        batch.join()
+        self.assertEquals(order, [True, False])
+
+class RateLimitedIndexTests(TestCase):
+
+    def setUp(self):
+        index_cache.clear()
+
+    def test_slow_and_failing_calls_slow_down(self):
+        index = FakeIndex({'slow': 1}, latency=0.2).start()
+        try:
+            bucket = ratelimit._buckets[index.url] = TokenBucket(100, 100,
+                    slow=0.1)
+            client.call(index.url, 'package_releases', 'slow', True)
+            self.assertEquals(bucket.rate, 50)
+            index.latency = 0
+            index.fault_rate = 1
+            self.assertRaises(xmlrpclib.Fault, client.call, index.url,
+                    'package_releases', 'slow', False)
+            self.assertEquals(bucket.rate, 25)
+        finally:
+            del ratelimit._buckets[index.url]
+            index.stop()
+
+    def test_empty_limit_means_unlimited(self):
+        url = 'http://unlimited.example.com/pypi/'
+        old_limits = conf.RATE_LIMITS
+        conf.RATE_LIMITS = {url: {}}
+        try:
+            self.assertEquals(ratelimit.get_bucket(url), None)
+            with ratelimit.limit(url):
+                pass
+        finally:
+            conf.RATE_LIMITS = old_limits
+            ratelimit._buckets.pop(url, None)
@@ -0,0 +1,28 @@
+from django.test import TestCase
+
+from pypackage.sync import changed_names, changed_releases
+
+class ChangedReleasesTests(TestCase):
+
+    def test_changed_releases(self):
+        changes = [
+            ('Fake-Package', '1.0', 0, 'new release', 10),
+            ('fake-package', '1.0', 0, 'add source file fake-1.0.tar.gz', 11),
+            ('fake-package', '0.9', 0, 'remove', 12),
+            ('fake-package', None, 0, 'add Owner someone', 13),
+            ('other', '2.0', 0, 'new release', 14),
+            ('other', '2.0', 0, 'remove', 15),
+        ]
+        changed = changed_releases(changes)
+        self.assertEquals(changed['fake-package'], (set(['1.0']), set(['0.9']), 10))
+        self.assertEquals(changed['other'], (set(), set(['2.0']), 14))
+
+    def test_changed_names(self):
+        changes = [
+            ('Fake-Package', None, 0, 'create', 10),
+            ('Fake-Package', '1.0', 0, 'new release', 11),
+            ('gone', '1.0', 0, 'remove', 12),
+            ('gone', None, 0, 'remove', 13),
+        ]
+        self.assertEquals(changed_names(changes),
+                (set(['Fake-Package']), set(['gone'])))
@@ -0,0 +1,31 @@
+from django.test import TestCase
+
+from pypackage.utils import run_in_pool, version_sort_key
+
+class RunInPoolTests(TestCase):
+
+    def test_errors_returned_with_their_items(self):
+        done = []
+        def func(item):
+            if item % 3 == 0:
+                raise ValueError(item)
+            done.append(item)
+        errors = run_in_pool(func, range(10), 4)
+        self.assertEquals(sorted(done), [1, 2, 4, 5, 7, 8])
+        self.assertEquals(sorted(item for item, e in errors), [0, 3, 6, 9])
+        self.assertTrue(all(isinstance(e, ValueError) for item, e in errors))
+
+class VersionSortKeyTests(TestCase):
+
+    def test_ordering(self):
+        versions = ['0.9', '1.0.dev1', '1.0a1', '1.0a2', '1.0b1', '1.0rc1',
+                '1.0', '1.0-1', '1.0.1', '1.1', '1.10', '2.0']
+        self.assertEquals(sorted(reversed(versions), key=version_sort_key),
+                versions)
+
+    def test_equivalent_versions(self):
+        self.assertEquals(version_sort_key('1.0'), version_sort_key('1.0.0'))
+        self.assertEquals(version_sort_key('1.0c1'), version_sort_key('1.0rc1'))
+
+    def test_only_digits_and_letters(self):
+        self.assertTrue(version_sort_key('1.0_beta+2').isalnum())
@@ -1,6 +1,7 @@
 from django.conf.urls.defaults import *
 
 from pypackage.forms import PyPackageForm
+from pypackage.views import release_history
 from package.views import (
         package_list,
         add_package
@@ -43,4 +44,10 @@ overridden_urlpatterns = patterns('',
     name    = 'grid',
     kwargs  = {'attributes':GRID_ATTRIBUTES},
     ),
+
+    url(
+        regex   = r"^packages/p/(?P<slug>[-\w]+)/releases/$",
+        view    = release_history,
+        name    = "pypackage_release_history",
+    ),
 )
@@ -0,0 +1,157 @@
+import re
+import threading
+
+from django.db import connection
+
+from pypackage import conf
+
+def bulk_insert(model, objs, batch_size=None):
+    """
+    Insert ``objs`` in batches of ``batch_size`` rows, falling back to one
+    insert per object on Django versions without ``bulk_create``.
+    """
+    if batch_size is None:
+        batch_size = conf.BULK_SIZE
+    manager = model._default_manager
+    if not hasattr(manager, 'bulk_create'):
+        for obj in objs:
+            obj.save(force_insert=True)
+        return
+    for i in range(0, len(objs), batch_size):
+        manager.bulk_create(objs[i:i + batch_size])
+
+def bulk_get(model, field, values, batch_size=None):
+    """
+    Return a dict mapping each of ``values`` found in ``field`` to its
+    object, looked up with IN queries of up to ``batch_size`` values.
+    """
+    if batch_size is None:
+        batch_size = conf.BULK_SIZE
+    values = list(values)
+    found = {}
+    for i in range(0, len(values), batch_size):
+        lookup = {'%s__in' % field: values[i:i + batch_size]}
+        for obj in model._default_manager.filter(**lookup):
+            found[getattr(obj, field)] = obj
+    return found
+
+def bulk_update(model, field, values, batch_size=None):
+    """
+    Set ``field`` on the rows of ``model`` whose primary keys are the keys
+    of ``values`` to the matching value, in UPDATE statements of up to
+    ``batch_size`` rows each.
+    """
+    if batch_size is None:
+        batch_size = conf.BULK_SIZE
+    qn = connection.ops.quote_name
+    column = qn(model._meta.get_field(field).column)
+    pk_column = qn(model._meta.pk.column)
+    items = values.items()
+    cursor = connection.cursor()
+    for i in range(0, len(items), batch_size):
+        batch = items[i:i + batch_size]
+        params = []
+        for pk, value in batch:
+            params.extend([pk, value])
+        params.extend([pk for pk, value in batch])
+        cursor.execute("UPDATE %s SET %s = CASE %s %s END WHERE %s IN (%s)" % (
+                qn(model._meta.db_table), column, pk_column,
+                ' '.join(['WHEN %s THEN %s'] * len(batch)), pk_column,
+                ', '.join(['%s'] * len(batch))), params)
+
+def run_in_pool(func, items, workers):
+    """
+    Call ``func`` with each of ``items`` on a pool of up to ``workers``
+    threads, each closing its database connection when done. Returns a
+    list of ``(item, error)`` pairs for the calls that raised.
+    """
+    pending = list(items)
+    lock = threading.Lock()
+    errors = []
+
+    def work():
+        try:
+            while True:
+                with lock:
+                    if not pending:
+                        return
+                    item = pending.pop(0)
+                try:
+                    func(item)
+                except Exception as e:
+                    with lock:
+                        errors.append((item, e))
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=work)
+            for i in range(max(1, min(workers, len(pending))))]
+    for thread in threads:
+        thread.setDaemon(True)
+        thread.start()
+    while [t for t in threads if t.isAlive()]:
+        # join with a timeout so ctrl-c still reaches us
+        for thread in threads:
+            thread.join(1)
+    return errors
+
+# version parsing as done by setuptools' parse_version
+component_re = re.compile(r'(\d+ | [a-z]+ | \.| -)', re.VERBOSE)
+replace = {'pre': 'c', 'preview': 'c', '-': 'final-', 'rc': 'c', 'dev': '@'}.get
+
+def _parse_version_parts(s):
+    for part in component_re.split(s):
+        part = replace(part, part)
+        if not part or part == '.':
+            continue
+        if part[:1] in '0123456789':
+            yield part.zfill(8)
+        else:
+            yield '*' + part
+    yield '*final'
+
+def parse_version(s):
+    parts = []
+    for part in _parse_version_parts(s.lower()):
+        if part.startswith('*'):
+            if part < '*final':
+                # remove '-' before a prerelease tag
+                while parts and parts[-1] == '*final-':
+                    parts.pop()
+            # remove trailing zeros from each series of numeric parts
+            while parts and parts[-1] == '00000000':
+                parts.pop()
+        parts.append(part)
+    return tuple(parts)
+
+SORT_KEY_PART_LENGTH = 9
+
+def _sort_key_part(part):
+    if not part.startswith('*'):
+        if len(part) > 8:
+            # wider numbers than parse_version pads to sort as the largest
+            return '199999999'
+        return '1' + part
+    chars = []
+    for c in part[1:]:
+        if 'a' <= c <= 'z':
+            chars.append(c)
+        elif c == '@':
+            # dev releases come before everything else
+            chars.append('0')
+        elif c == '-':
+            chars.append('2')
+        else:
+            chars.append('1')
+    return ('0' + ''.join(chars))[:SORT_KEY_PART_LENGTH].ljust(
+            SORT_KEY_PART_LENGTH, '0')
+
+def version_sort_key(version, max_length=255):
+    """
+    Return a string that sorts like ``parse_version(version)``.
+
+    Each version part becomes a fixed width run of digits and lower case
+    letters, so the keys order the same under any database collation.
+    """
+    key = ''.join(_sort_key_part(p) for p in parse_version(version))
+    return key[:max_length]
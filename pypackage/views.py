@@ -1 +1,22 @@
-# Create your views here.
+from django.http import Http404
+from django.shortcuts import get_object_or_404, render_to_response
+from django.template import RequestContext
+
+from pypackage.models import PyPackage
+
+
+def release_history(request, slug,
+        template_name='pypackage/release_rows.html'):
+    """
+    Render the next page of a package's release history as table rows, for
+    appending to the page already shown.
+    """
+    pypackage = get_object_or_404(PyPackage, packaginator_package__slug=slug)
+    try:
+        history = pypackage.release_history(request.GET.get('cursor'))
+    except ValueError:
+        raise Http404
+    return render_to_response(template_name, {
+        'package': pypackage.packaginator_package,
+        'history': history,
+    }, context_instance=RequestContext(request))